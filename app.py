@@ -3,16 +3,24 @@
 import streamlit as st
 import google.generativeai as genai
 from datetime import datetime
-import docx
-import io
+import hashlib
 import json
-import re 
-import traceback
-
-# --- App Constants ---
-MAX_FILE_SIZE_MB = 15
-MAX_FILE_SIZE_BYTES = MAX_FILE_SIZE_MB * 1024 * 1024
-MODEL_NAME = "gemini-2.5-pro" 
+import time
+import uuid
+
+from scheduler import JOB_SUCCEEDED, JobScheduler
+from telemetry import RunTelemetry
+
+from pipeline import (
+    MAX_FILE_SIZE_MB,
+    MAX_FILE_SIZE_BYTES,
+    EXTRACTION_MODEL_NAME,
+    MODEL_NAME,
+    PACKED_CHUNKS_PER_REQUEST,
+    ResponseCache,
+    RunCheckpoint,
+    get_text_from_docx,
+)
 
 # --- Page Configuration ---
 st.set_page_config(
@@ -21,278 +29,135 @@ st.set_page_config(
     layout="wide"
 )
 
-# --- Prompts ---
-
-# --- TRANSCRIPT ANALYSIS PROMPTS (MULTI-PHASE) ---
-
-# Prompt 1A: The Signals Intelligence Chunk Analysis Prompt for transcripts
-CHUNK_ANALYSIS_PROMPT = """
-**Persona:**
-You are an AI Signals Intelligence (SIGINT) Analyst. Your sole mission is to meticulously analyze a small, decontextualized snippet of a longer conversation and extract every potential data point without judgment or synthesis. You are a specialist in identifying and categorizing raw information for later analysis by a different system. You are incapable of missing a requirement.
-
-**Primary Directive:**
-You will use a Chain-of-Thought process. For each sentence in the provided transcript chunk, you will first think about what signals are present, and only then will you add them to a final JSON object. Your ONLY output must be a single, valid JSON object. Do not output your thoughts, only the final JSON.
-
-**Core Principles of Extraction:**
-1.  **Deconstruct Every Sentence:** Do not read paragraphs as a whole. Analyze one sentence at a time. A single sentence can contain multiple signals. You must extract all of them.
-2.  **Extract, Do Not Interpret:** Do not summarize or rephrase. Capture the essence of the statement, using direct quotes where possible.
-3.  **No Signal Left Behind:** Your primary goal is to capture everything that *might* be relevant.
-4.  **Attribute to Speaker:** If the text indicates who is speaking (e.g., "Sarah:", "[John]"), you MUST populate the `speaker` field. If it's unclear, use "Unknown".
-
-**Signal Categorization Protocol:**
-Categorize every extracted point into ONE of these: `Explicit_Requirement`, `Implicit_Requirement`, `Technical_Specification`, `UI_UX_Detail`, `Decision_Made`, `Action_Item`, `User_Pain_Point`, `Business_Goal`, `Open_Question`, `Identified_Risk`.
-
-**Required JSON Output Format:**
-```json
-{{
-  "extracted_signals": [
-    {{
-      "category": "ENUM(One of the categories from the protocol above)",
-      "speaker": "STRING",
-      "content": "STRING(The extracted statement or key phrase)",
-      "priority_signal": "ENUM('High', 'Medium', 'Low')"
-    }}
-  ]
-}}
-```
-
-Now, apply this rigorous process to the following transcript chunk.
-
----TRANSCRIPT CHUNK---
-{chunk_text}
----TRANSCRIPT CHUNK---
-"""
-
-# Prompt 1B: The Master Architect Synthesis Prompt for transcripts
-FINAL_SYNTHESIS_PROMPT = """
-**Persona:**
-You are an AI Master Architect. Your exclusive function is to receive structured, raw intelligence data (in JSON format) and synthesize it into a single, comprehensive, and strategically coherent Product Requirements Document (PRD) formatted for optimal display in systems like Azure DevOps wikis.
-
-**Primary Directive:**
-Your sole input is a list of JSON objects, where each object is an "extracted signal". Your only output must be a single, human-readable PRD formatted in Markdown. You must process **every single signal** from the input and ensure it is appropriately represented in the final document, using markdown tables for clarity where specified in the template.
-
-**Core Principles of Synthesis:**
-1.  **Input is Ground Truth:** The provided JSON data is your only source of information. Do not add requirements not supported by a signal.
-2.  **De-duplicate & Synthesize:** Intelligently merge related signals into a single, cohesive requirement entry in the final PRD.
-3.  **Structure is Paramount:** Follow the PRD template below with absolute precision. Use markdown tables exactly as shown.
-4.  **Follow the Mapping Guide:** Use the protocol to determine where each signal category should be placed in the final document.
-
-**Signal-to-PRD Mapping Protocol:**
--   **`Explicit_Requirement` / `Implicit_Requirement`:** These form the "Requirement" sections in the Work Breakdown.
--   **`UI_UX_Detail`:** Translate into FE Tasks or Acceptance Criteria.
--   **`Technical_Specification`:** Translate into BE Tasks, Acceptance Criteria, or NFRs.
--   **`User_Pain_Point` / `Business_Goal`:** Use for the Strategic Overview and the "so that I can..." part of user stories.
--   **`Decision_Made`:** Use to state definitive behavior in Acceptance Criteria.
--   **`Action_Item` / `Open_Question`:** Convert into line items in the "Open Questions & Action Items" section.
--   **`Identified_Risk`:** Add to the "Potential Risks" table for the relevant requirement.
-
-**--- PRD TEMPLATE FOR AZURE DEVOPS WIKI ---**
-*Generate the final document using this exact structure.*
-
-# PRD: Lighthouse Platform - [Feature Name]
----
-## 1. Strategic Overview
-- **Feature Name:** [Synthesize a clear name from the signals]
-- **User "Job to Be Done" (JTBD):** [Synthesize from `User_Pain_Point` and `Implicit_Requirement` signals: "When I [context], I want to [motivation], so I can [expected outcome]."]
-- **Business Goal:** [Synthesize from `Business_Goal` signals.]
-- **Success Metrics:** [Infer potential KPIs from business goals.]
----
-## 2. Open Questions & Action Items
-*Synthesized directly from `Open_Question` and `Action_Item` signals.*
-- **[ ] Open Question:** [Content of `Open_Question` signal] - **Owner:** [Suggest a role]
-- **[ ] Action Item:** [Content of `Action_Item` signal] - **Owner:** [Suggest a role]
----
-## 3. Non-Functional Requirements (NFRs)
-*Synthesize from any relevant `Technical_Specification` signals that are global in nature. Format as a markdown table.*
-
-| Category      | Requirement                                                | Metric/Standard                  |
-|---------------|------------------------------------------------------------|----------------------------------|
-| Performance   | [e.g., API Response Time]                                  | [e.g., 95% of responses < 500ms] |
-| Security      | [e.g., Authentication]                                     | [e.g., All endpoints are secured]|
-| Accessibility | [e.g., Keyboard Navigation]                                | [e.g., WCAG 2.1 AA Compliant]    |
-
----
-## 4. Epic & Work Breakdown Structure
-*A complete deconstruction of the work required, built by mapping all relevant signals.*
-### ### Epic: [Synthesize a high-level Epic title]
-*This epic covers all work required for the discussed feature set.*
----
-### Requirement: [Title synthesized from one or more `Explicit_Requirement` signals]
-- **User Story:** [Synthesize from signals]
-- **Priority:** [Determine from `priority_signal` values]
-- **Acceptance Criteria:**
-    - [ ] [Synthesize from `UI_UX_Detail`, `Technical_Specification`, and `Decision_Made` signals.]
-    - [ ] [Add another criterion...]
-
-**Implementation Tasks:**
-*Format as a markdown table.*
-| Discipline | Task Description                                       | Notes                  |
-|------------|--------------------------------------------------------|------------------------|
-| Frontend   | [Synthesize from one or more `UI_UX_Detail` signals.]  | [Any additional notes] |
-| Backend    | [Synthesize from one or more `Technical_Specification` signals.] | [Any additional notes] |
-| QA         | [Create a specific task to verify the acceptance criteria.] | [e.g., "End-to-end test"] |
-
-**Potential Risks:**
-*Format as a markdown table.*
-| Risk Category | Description                                         | Mitigation Strategy         |
-|---------------|-----------------------------------------------------|-----------------------------|
-| [e.g., Technical] | [Synthesize from any `Identified_Risk` signals.] | [Suggest a mitigation plan] |
-
----
-*(Continue this structure for every other requirement identified in the input signals...)*
-"""
-
-
-# --- PM NOTES ANALYSIS PROMPT (SINGLE-PHASE) ---
-PM_NOTES_PROMPT = """
-**Persona:**
-You are an AI Product Strategist. Your expertise is in taking a product manager's rough, unstructured notes and transforming them into a comprehensive, engineering-ready Product Requirements Document (PRD), formatted for optimal display in systems like Azure DevOps wikis.
-
-**Primary Directive:**
-Analyze the provided PM notes. Your goal is to first deconstruct the information and rebuild it into a structured PRD using markdown tables for clarity. After structuring the notes, you will then provide a section with strategic suggestions for improving the feature.
-
-**Core Principles of Interpretation & Analysis:**
-1.  **Structure from Chaos:** Your first job is to impose the PRD structure onto the notes. Group related points into a single requirement.
-2.  **Identify the Gaps:** If the notes are unclear or missing key details, you must create logical, inferred placeholders and flag them in the "Open Questions" section.
-3.  **Be Exhaustive:** Do not discard any point from the notes. Every idea or feature mentioned must be translated into a corresponding section in the PRD.
-4.  **Think Strategically:** In the final "Suggestions" section, think beyond the notes. Consider the user experience, potential edge cases, and future scalability. Provide concrete ideas to make the feature truly excellent.
-
-**--- PRD TEMPLATE FOR AZURE DEVOPS WIKI ---**
-*You must generate the final document using this exact structure.*
-
-# PRD: Lighthouse Platform - [Feature Name]
----
-## 1. Strategic Overview
-- **Feature Name:** [Determine a clear name from the notes]
-- **User "Job to Be Done" (JTBD):** [Determine from the notes: "When I [context], I want to [motivation], so I can [expected outcome]."]
-- **Business Goal:** [Determine from the notes.]
-- **Success Metrics:** [Infer potential KPIs from the goals.]
----
-## 2. Open Questions & Action Items
-*List all points that need clarification based on your analysis of the notes.*
-- **[ ] Open Question:** [e.g., "What formats should be supported for export (CSV, PDF, etc.)?"] - **Owner:** @Product
-- **[ ] Action Item:** [e.g., "Confirm performance requirements for large data exports."] - **Owner:** @Engineering
----
-## 3. Non-Functional Requirements (NFRs)
-*Infer any NFRs mentioned or implied in the notes. Format as a markdown table.*
-
-| Category      | Requirement                                                | Metric/Standard                  |
-|---------------|------------------------------------------------------------|----------------------------------|
-| Performance   | [e.g., API Response Time]                                  | [e.g., Notes mention "must be fast"] |
-| Security      | [e.g., Authentication]                                     | [e.g., Notes imply "only authenticated users"]|
-| Accessibility | [e.g., Keyboard Navigation]                                | [e.g., Inferred: WCAG 2.1 AA Compliant]    |
-
----
-## 4. Epic & Work Breakdown Structure
-*A complete deconstruction of the work required, built from the notes.*
-### ### Epic: [Create a high-level Epic title from the notes]
-*This epic covers all work for the features described.*
----
-### Requirement: [Title for the first requirement identified in the notes]
-- **User Story:** [Write a full user story based on the note]
-- **Priority:** [Assign a logical priority, e.g., P1-High]
-- **Acceptance Criteria:**
-    - [ ] [Create logical acceptance criteria for the requirement.]
-    - [ ] [Add another criterion...]
-
-**Implementation Tasks:**
-*Format as a markdown table.*
-| Discipline | Task Description                                       | Notes                  |
-|------------|--------------------------------------------------------|------------------------|
-| Frontend   | [Create a specific frontend task.]                     | [Any additional notes] |
-| Backend    | [Create a specific backend task.]                      | [Any additional notes] |
-| QA         | [Create a specific testing task.]                      | [e.g., "End-to-end test"] |
-
-**Potential Risks:**
-*Format as a markdown table.*
-| Risk Category | Description                                         | Mitigation Strategy         |
-|---------------|-----------------------------------------------------|-----------------------------|
-| [e.g., Technical] | [Identify any potential risks based on the notes.] | [Suggest a mitigation plan] |
-
----
-*(Continue this structure for every other feature or requirement identified in the notes...)*
-
----
-## 5. Strategic Suggestions & Future Enhancements
-*Your analysis and ideas for making this feature better.*
-- **Immediate Improvements (V1.0):**
-    - **Suggestion:** [Provide a specific, actionable idea to improve the initial version of the feature. e.g., "Add a 'Recent Exports' link in the modal so users can quickly re-download files."]
-    - **Rationale:** [Explain why this suggestion adds value.]
-- **Future Roadmap Ideas (V2.0 and beyond):**
-    - **Suggestion:** [Provide a bigger-picture idea for the future. e.g., "Implement scheduled, recurring exports that can be emailed to users automatically."]
-    - **Rationale:** [Explain how this enhancement addresses a deeper user need or business goal.]
-"""
-
-
-# --- Functions ---
-
-def get_text_from_docx(docx_bytes):
-    """Extracts text from a .docx file."""
-    doc = docx.Document(io.BytesIO(docx_bytes))
-    full_text = []
-    for para in doc.paragraphs:
-        full_text.append(para.text)
-    return '\n'.join(full_text)
-
-def get_text_chunks(text, chunk_size=12000, overlap=500):
-    """Splits text into overlapping chunks. Increased chunk size for Gemini."""
-    if len(text) <= chunk_size:
-        return [text]
-    
-    chunks = []
-    start = 0
-    while start < len(text):
-        end = start + chunk_size
-        chunks.append(text[start:end])
-        start += chunk_size - overlap
-    return chunks
-
-def get_gemini_response(model, prompt_parts, is_json_output=False):
-    """Generic function to get a response from the Gemini model."""
-    config = {"temperature": 0.0}
-    if is_json_output:
-        config["response_mime_type"] = "application/json"
-    
-    response = model.generate_content(prompt_parts, generation_config=config)
-    return response.text
-
-def process_long_transcript(model, transcript_text):
-    """Orchestrates the chunking and synthesis process using Gemini for transcripts."""
-    chunks = get_text_chunks(transcript_text)
-    all_signals = []
-    progress_bar = st.progress(0, text="Phase 1: Analyzing transcript chunks...")
-    total_chunks = len(chunks)
-
-    for i, chunk in enumerate(chunks):
-        prompt_for_chunk = CHUNK_ANALYSIS_PROMPT.format(chunk_text=chunk)
-        try:
-            raw_response = get_gemini_response(model, prompt_for_chunk, is_json_output=True)
-            data = json.loads(raw_response)
-            if isinstance(data, dict) and "extracted_signals" in data and isinstance(data["extracted_signals"], list):
-                all_signals.extend(data["extracted_signals"])
-            elif isinstance(data, list):
-                all_signals.extend(data)
-            else:
-                st.warning(f"JSON from chunk {i+1} has an unexpected structure. Skipping.")
-        except Exception as e:
-            st.warning(f"Could not process chunk {i+1} due to an error: {e}. Skipping.")
-        progress_bar.progress((i + 1) / total_chunks, text=f"Phase 1: Analyzed chunk {i+1} of {total_chunks}")
-        
-    progress_bar.progress(1.0, text="Phase 2: Synthesizing final document from all signals...")
-    
-    if not all_signals:
-        st.error("Analysis complete, but no valid requirements could be extracted. The final PRD cannot be generated.", icon="🚨")
-        return None
-
-    combined_signals_json = json.dumps({"all_extracted_signals": all_signals}, indent=2)
-    final_prd = get_gemini_response(model, [FINAL_SYNTHESIS_PROMPT, combined_signals_json])
-    
-    progress_bar.empty()
-    return final_prd
-
-def process_pm_notes(model, notes_text):
-    """Processes PM notes directly into a PRD in a single pass."""
-    return get_gemini_response(model, [PM_NOTES_PROMPT, notes_text])
+MAX_STORED_RESULTS = 5   # Completed runs kept in session state per browser session
+JOB_POLL_SECONDS = 1     # How often a session refreshes the status of its running job
+
+
+# --- Cached Resources & Session State ---
+# Streamlit re-executes this script on every interaction; everything below survives reruns.
+
+@st.cache_resource
+def get_gemini_model(api_key, model_name=MODEL_NAME):
+    """Configures the Gemini client once per process and reuses the model object across reruns."""
+    genai.configure(api_key=api_key)
+    return genai.GenerativeModel(model_name)
+
+@st.cache_resource
+def get_response_cache():
+    """One shared SQLite-backed response cache per process."""
+    return ResponseCache()
+
+@st.cache_resource
+def get_job_scheduler():
+    """One job queue and model-call budget shared by every session of this process."""
+    return JobScheduler()
+
+@st.cache_data(max_entries=16, show_spinner="Reading document...")
+def extract_uploaded_text(file_hash, file_type, _uploaded_file):
+    """
+    Decodes an upload to text, memoized by the file's content hash (the file object itself is not hashed).
+    Also returns the seconds the decode took, so runs served from the memo still report the real cost.
+    """
+    started = time.perf_counter()
+    if file_type == "application/vnd.openxmlformats-officedocument.wordprocessingml.document":
+        text = get_text_from_docx(_uploaded_file)
+    else:
+        text = _uploaded_file.getvalue().decode("utf-8")
+    return text, time.perf_counter() - started
+
+def uploaded_file_hash(uploaded_file):
+    """SHA-256 of the upload's content, computed once per uploaded file and kept in session state."""
+    hashes = st.session_state.setdefault("upload_hashes", {})
+    if uploaded_file.file_id not in hashes:
+        hashes[uploaded_file.file_id] = hashlib.sha256(uploaded_file.getbuffer()).hexdigest()
+    return hashes[uploaded_file.file_id]
+
+def get_session_id():
+    """Stable id of this browser session, used by the scheduler to share model calls fairly."""
+    return st.session_state.setdefault("session_id", uuid.uuid4().hex)
+
+def store_result(result_key, result):
+    """Saves a completed run in session state, keeping only the most recent MAX_STORED_RESULTS."""
+    results = st.session_state.setdefault("prd_results", {})
+    results.pop(result_key, None)
+    results[result_key] = result
+    while len(results) > MAX_STORED_RESULTS:
+        results.pop(next(iter(results)))
+
+def collect_job(result_key, job):
+    """Moves a finished job's outcome into session state and releases it from the scheduler."""
+    st.session_state.get("active_jobs", {}).pop(result_key, None)
+    get_job_scheduler().forget(job.id)
+    failed_runs = st.session_state.setdefault("failed_runs", {})
+    if job.status != JOB_SUCCEEDED:
+        failed_runs[result_key] = {"errors": job.errors, "warnings": job.warnings, "telemetry": job.telemetry}
+        return
+    failed_runs.pop(result_key, None)
+    run_summary = (
+        f"Queued {job.started - job.submitted:.1f}s, first text after {job.timings.get('time_to_first_token', 0.0):.1f}s, "
+        f"total {job.timings.get('total_time', 0.0):.1f}s"
+    )
+    run_totals = job.telemetry.totals()
+    run_summary += f" · {run_totals['model_calls']} model calls, {run_totals['cached_calls']} served from the response cache"
+    store_result(result_key, {
+        "prd": job.result,
+        "signals": job.signals,
+        "warnings": job.warnings,
+        "summary": run_summary,
+        "telemetry": job.telemetry,
+        "timestamp": datetime.now().strftime("%Y%m%d_%H%M%S"),
+    })
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def render_job_status(result_key, job_id):
+    """Polls this session's running job, showing its progress and the PRD as it streams in."""
+    scheduler = get_job_scheduler()
+    job = scheduler.get(job_id)
+    if job is None or job.done:
+        if job is not None:
+            collect_job(result_key, job)
+        else:
+            st.session_state.get("active_jobs", {}).pop(result_key, None)
+        # Rerun the whole page so the result is rendered by the same code path as every later rerun.
+        st.rerun()
+
+    stats = scheduler.stats()
+    st.progress(job.progress, text=job.message)
+    st.caption(
+        f"Model calls across all sessions: {stats['calls_in_flight']} running, {stats['calls_waiting']} waiting · "
+        f"Jobs: {stats['jobs']['running']} running, {stats['jobs']['queued']} queued"
+    )
+    for message in job.warnings:
+        st.warning(message)
+    if job.partial_text:
+        with st.expander("View Full Requirements Document", expanded=True):
+            st.markdown(job.partial_text)
+
+def render_run_diagnostics(run_telemetry):
+    """Collapsible panel with model-call and token totals, per-span timings and exports."""
+    with st.expander("Run diagnostics", expanded=False):
+        run_totals = run_telemetry.totals()
+        metric_columns = st.columns(4)
+        metric_columns[0].metric("Model calls", run_totals["model_calls"])
+        metric_columns[1].metric("Cached calls", run_totals["cached_calls"])
+        metric_columns[2].metric("Prompt tokens", f"{run_totals['prompt_tokens']:,}")
+        metric_columns[3].metric("Output tokens", f"{run_totals['output_tokens']:,}")
+        st.dataframe(run_telemetry.summary(), width="stretch")
+        if run_telemetry.counters:
+            st.caption(" · ".join(f"{name}: {value}" for name, value in sorted(run_telemetry.counters.items())))
+        export_columns = st.columns(2)
+        export_columns[0].download_button(
+            label="Export spans (.jsonl)",
+            data=run_telemetry.to_json_lines().encode('utf-8'),
+            file_name="run_diagnostics.jsonl",
+            mime='application/x-ndjson'
+        )
+        export_columns[1].download_button(
+            label="Export Prometheus snapshot",
+            data=run_telemetry.to_prometheus().encode('utf-8'),
+            file_name="run_diagnostics.prom",
+            mime='text/plain'
+        )
 
 
 # --- Main Application ---
@@ -306,8 +171,11 @@ try:
         st.error("Google Gemini API key is missing. Please add it to your Streamlit secrets.", icon="🚨")
         st.stop()
     
-    genai.configure(api_key=GEMINI_API_KEY)
-    gemini_model = genai.GenerativeModel(MODEL_NAME)
+    gemini_model = get_gemini_model(GEMINI_API_KEY)
+    # Phase 1 chunk extraction runs on a faster model and escalates to gemini_model when needed.
+    # Operators can pick another model with `extraction_model` in the secrets, or set it to "" to turn this off.
+    EXTRACTION_MODEL = st.secrets["google_generativeai"].get("extraction_model", EXTRACTION_MODEL_NAME)
+    extraction_model = get_gemini_model(GEMINI_API_KEY, EXTRACTION_MODEL) if EXTRACTION_MODEL else None
 
 except KeyError:
     st.error("Google Gemini credentials are not set correctly. Make sure you have a [google_generativeai] section with an 'api_key' in your secrets.", icon="🚨")
@@ -336,48 +204,104 @@ if uploaded_file:
     if uploaded_file.size > MAX_FILE_SIZE_BYTES:
         st.error(f"File size exceeds the {MAX_FILE_SIZE_MB}MB limit. Please upload a smaller file.", icon="🚨")
     else:
-        # Read file content
-        raw_text = ""
-        if uploaded_file.type == "text/plain":
-            raw_text = uploaded_file.getvalue().decode("utf-8")
-        elif uploaded_file.type == "application/vnd.openxmlformats-officedocument.wordprocessingml.document":
-            raw_text = get_text_from_docx(uploaded_file.getvalue())
+        # Read file content (memoized by content hash, so reruns skip decoding entirely)
+        run_telemetry = RunTelemetry()
+        file_hash = uploaded_file_hash(uploaded_file)
+        span_name = "docx_extraction" if uploaded_file.name.lower().endswith(".docx") else "file_decode"
+        raw_text, extraction_seconds = extract_uploaded_text(file_hash, uploaded_file.type, uploaded_file)
+        run_telemetry.add_span(span_name, extraction_seconds, bytes=uploaded_file.size)
         
         st.subheader("3. Generate Document")
-        if st.button(f"🚀 Generate PRD from {input_type}"):
+        bypass_cache = st.checkbox(
+            "Bypass response cache",
+            help="Always call the model, ignoring responses and saved progress from earlier runs of this document."
+        )
+        response_cache = None if bypass_cache else get_response_cache()
+        incremental = input_type == "Meeting Transcript" and st.checkbox(
+            "Incremental re-analysis",
+            value=False,
+            disabled=bypass_cache,
+            help="Split the transcript where its content allows, so that after a revision only the changed parts are sent to the model again; the rest are served from the response cache."
+        ) and not bypass_cache
+
+        result_key = f"{file_hash}:{input_type}"
+        stored_result = st.session_state.get("prd_results", {}).get(result_key)
+        failed_run = st.session_state.get("failed_runs", {}).get(result_key)
+        active_job_id = st.session_state.get("active_jobs", {}).get(result_key)
+        if active_job_id is not None:
+            st.button("⏳ Generating PRD...", disabled=True)
+            generate_clicked = False
+        elif stored_result is None:
+            generate_clicked = st.button(f"🚀 Generate PRD from {input_type}")
+        else:
+            generate_clicked = st.button(
+                "🔄 Regenerate PRD",
+                help="Run the analysis again. The current result is replaced when the new run completes."
+            )
+
+        if active_job_id is not None:
+            # The job runs on the shared scheduler; this session only polls it, so the page stays responsive.
+            render_job_status(result_key, active_job_id)
+
+        elif generate_clicked:
             if not raw_text.strip():
                 st.warning("The uploaded document appears to be empty. Please upload a file with content.", icon="⚠️")
             else:
-                analysis_result = None
-                try:
-                    if input_type == "Meeting Transcript":
-                        with st.spinner("Starting multi-phase analysis of transcript... This may take several minutes."):
-                            analysis_result = process_long_transcript(
-                                model=gemini_model,
-                                transcript_text=raw_text
-                            )
-                    elif input_type == "Product Manager's Notes":
-                        with st.spinner("Analyzing PM notes and generating PRD..."):
-                           analysis_result = process_pm_notes(
-                               model=gemini_model,
-                               notes_text=raw_text
-                           )
-                    
-                    if analysis_result:
-                        st.success("Analysis Complete!", icon="🎉")
-
-                        with st.expander("View Full Requirements Document", expanded=True):
-                            st.markdown(analysis_result)
-                        
-                        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                        file_name = f"Lighthouse_Requirements_{timestamp}.md"
-                        
-                        st.download_button(
-                            label="⬇️ Download Requirements as .md File",
-                            data=analysis_result.encode('utf-8'),
-                            file_name=file_name,
-                            mime='text/markdown'
-                        )
-                except Exception as e:
-                    st.error(f"An error occurred during processing: {e}", icon="🚨")
-                    traceback.print_exc()
+                scheduler = get_job_scheduler()
+                if input_type == "Meeting Transcript":
+                    job = scheduler.submit_transcript(
+                        get_session_id(),
+                        gemini_model,
+                        raw_text,
+                        telemetry=run_telemetry,
+                        cache=response_cache,
+                        checkpoint=None if bypass_cache else RunCheckpoint.for_document(raw_text),
+                        incremental=incremental,
+                        extraction_model=extraction_model,
+                        pack_size=PACKED_CHUNKS_PER_REQUEST
+                    )
+                else:
+                    job = scheduler.submit_pm_notes(
+                        get_session_id(),
+                        gemini_model,
+                        raw_text,
+                        telemetry=run_telemetry,
+                        cache=response_cache
+                    )
+                st.session_state.setdefault("active_jobs", {})[result_key] = job.id
+                st.session_state.get("failed_runs", {}).pop(result_key, None)
+                st.rerun()
+
+        elif failed_run is not None:
+            for message in failed_run["warnings"]:
+                st.warning(message)
+            for message in failed_run["errors"]:
+                st.error(message, icon="🚨")
+            render_run_diagnostics(failed_run["telemetry"])
+
+        elif stored_result is not None:
+            st.success("Analysis Complete!", icon="🎉")
+            st.caption(stored_result["summary"])
+            for message in stored_result["warnings"]:
+                st.warning(message)
+
+            with st.expander("View Full Requirements Document", expanded=True):
+                st.markdown(stored_result["prd"])
+
+            file_name = f"Lighthouse_Requirements_{stored_result['timestamp']}.md"
+            download_columns = st.columns(2)
+            download_columns[0].download_button(
+                label="⬇️ Download Requirements as .md File",
+                data=stored_result["prd"].encode('utf-8'),
+                file_name=file_name,
+                mime='text/markdown'
+            )
+            if stored_result["signals"]:
+                download_columns[1].download_button(
+                    label=f"⬇️ Download {len(stored_result['signals'])} Extracted Signals (.json)",
+                    data=json.dumps({"all_extracted_signals": stored_result["signals"]}, indent=2).encode('utf-8'),
+                    file_name=f"Lighthouse_Signals_{stored_result['timestamp']}.json",
+                    mime='application/json'
+                )
+
+            render_run_diagnostics(stored_result["telemetry"])
@@ -0,0 +1,107 @@
+# benchmarks/corpus.py
+"""Deterministic synthetic meeting transcripts (.txt text and .docx bytes) for benchmarking."""
+
+import io
+import random
+import zipfile
+from xml.sax.saxutils import escape
+
+SPEAKERS = ("Sarah", "John Smith", "Priya", "Marcus", "Elena Rossi", "Dev Lead", "QA")
+SUBJECTS = (
+    "the export dialog", "the audit log", "single sign-on", "the reporting API", "bulk upload",
+    "the mobile dashboard", "role permissions", "the notification service", "search filters",
+)
+TEMPLATES = (
+    "We need {subject} to support CSV and PDF before the next release.",
+    "Customers keep complaining that {subject} is too slow on large accounts.",
+    "Let's decide that {subject} stays behind a feature flag for the pilot.",
+    "Can someone confirm who owns {subject} after the reorg?",
+    "The risk with {subject} is that we break existing integrations.",
+    "I'll follow up with security about {subject} by Friday.",
+    "From a UX point of view {subject} should keep the primary button on the right.",
+    "Technically {subject} has to respond in under five hundred milliseconds.",
+    "The business goal is to cut support tickets about {subject} in half.",
+    "Um, yeah, I think that makes sense, let's keep going.",
+)
+
+# Target sizes from 10 KB up to the app's 15 MB upload limit.
+DEFAULT_SIZES = (10 * 1024, 100 * 1024, 1024 * 1024, 5 * 1024 * 1024, 15 * 1024 * 1024)
+
+
+def iter_turns(target_bytes, seed=0):
+    """Yields (speaker, utterance) pairs until roughly `target_bytes` of transcript text is produced."""
+    rng = random.Random(seed)
+    size = 0
+    while size < target_bytes:
+        speaker = rng.choice(SPEAKERS)
+        utterance = " ".join(
+            rng.choice(TEMPLATES).format(subject=rng.choice(SUBJECTS))
+            for _ in range(rng.randint(1, 8))
+        )
+        size += len(speaker) + len(utterance) + 3
+        yield speaker, utterance
+
+def generate_transcript(target_bytes, seed=0):
+    """Returns a "Speaker: text" transcript of roughly `target_bytes` characters."""
+    return "".join(f"{speaker}: {utterance}\n" for speaker, utterance in iter_turns(target_bytes, seed))
+
+def revise_transcript(transcript, fraction=0.05, seed=1, insert=False):
+    """
+    Returns a revision of `transcript` with a contiguous `fraction` of its turns, starting midway,
+    replaced by freshly generated ones, as when a corrected section is pasted into a transcript.
+    With `insert`, the new turns are inserted there instead, shifting everything after them.
+    """
+    lines = transcript.splitlines(keepends=True)
+    count = max(1, int(len(lines) * fraction))
+    start = max(0, (len(lines) - count) // 2)
+    replaced = "".join(lines[start:start + count])
+    replacement = generate_transcript(len(replaced), seed=seed)
+    return "".join(lines[:start]) + replacement + "".join(lines[start if insert else start + count:])
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/word/document.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+    '</Types>'
+)
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="word/document.xml"/>'
+    '</Relationships>'
+)
+
+def _paragraph(text):
+    return f'<w:p><w:r><w:t xml:space="preserve">{escape(text)}</w:t></w:r></w:p>'
+
+def generate_docx(target_bytes, seed=0, table_every=50):
+    """
+    Returns .docx bytes holding roughly `target_bytes` of transcript text, one paragraph per turn,
+    with a small action-item table after every `table_every` turns. The XML is written directly so
+    multi-megabyte documents build in seconds.
+    """
+    body = io.StringIO()
+    body.write(
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body>'
+    )
+    for i, (speaker, utterance) in enumerate(iter_turns(target_bytes, seed), start=1):
+        body.write(_paragraph(f"{speaker}: {utterance}"))
+        if table_every and i % table_every == 0:
+            body.write("<w:tbl>")
+            for row in (("Action item", "Owner"), (f"Follow up on item {i}", speaker)):
+                body.write("<w:tr>" + "".join(f"<w:tc>{_paragraph(cell)}</w:tc>" for cell in row) + "</w:tr>")
+            body.write("</w:tbl>")
+    body.write("<w:sectPr/></w:body></w:document>")
+
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as package:
+        package.writestr("[Content_Types].xml", _CONTENT_TYPES)
+        package.writestr("_rels/.rels", _ROOT_RELS)
+        package.writestr("word/document.xml", body.getvalue())
+    return buffer.getvalue()
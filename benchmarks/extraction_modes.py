@@ -0,0 +1,121 @@
+# benchmarks/extraction_modes.py
+"""
+Compares Phase 1 extraction modes against the fake Gemini backend: the main model alone,
+a fast-model cascade with escalation, packed requests, and both combined.
+
+For each mode it reports wall time, calls per model, prompt and output tokens, chunks
+escalated (or, without a cascade, re-extracted alone) and signal recall against a perfect
+reference extraction of the same chunks.
+The fast model is modelled as quicker but less thorough (lower recall, occasional sparse
+answers and truncated JSON); packing can be given a recall penalty per extra chunk.
+
+Example:
+    python -m benchmarks.extraction_modes --size 1M --pack-sizes 2 4 8
+"""
+
+import argparse
+import json
+import sys
+import time
+
+from benchmarks.corpus import generate_transcript
+from benchmarks.fake_gemini import FakeGenerativeModel, LatencyDistribution
+from benchmarks.run_benchmarks import git_revision, parse_size
+from pipeline import RateLimiter, analyze_chunk, analyze_chunks_concurrently, get_text_chunks
+from telemetry import RunTelemetry
+
+
+def reference_contents(chunks, args):
+    """The signals a perfect extractor finds in each chunk, as sets of content strings."""
+    reference = FakeGenerativeModel(model_name="reference", seed=args.seed)
+    return [{s["content"] for s in analyze_chunk(reference, chunk)} for chunk in chunks]
+
+def run_mode(chunks, reference, args, cascade, pack_size):
+    """Runs Phase 1 in one mode and returns its metrics."""
+    main_model = FakeGenerativeModel(
+        model_name="fake-pro", latency=LatencyDistribution.parse(args.latency), recall=args.main_recall,
+        seconds_per_1k_output_tokens=args.seconds_per_1k_output_tokens, pack_recall_penalty=args.pack_recall_penalty,
+        seed=args.seed
+    )
+    fast_model = FakeGenerativeModel(
+        model_name="fake-flash", latency=LatencyDistribution.parse(args.fast_latency), recall=args.fast_recall,
+        sparse_rate=args.fast_sparse_rate, invalid_json_rate=args.fast_invalid_json_rate,
+        seconds_per_1k_output_tokens=args.fast_seconds_per_1k_output_tokens,
+        pack_recall_penalty=args.pack_recall_penalty, seed=args.seed
+    )
+    telemetry = RunTelemetry()
+    started = time.perf_counter()
+    results = analyze_chunks_concurrently(
+        main_model,
+        chunks,
+        max_workers=args.max_workers,
+        rate_limiter=RateLimiter(args.requests_per_minute),
+        telemetry=telemetry,
+        extraction_model=fast_model if cascade else None,
+        pack_size=pack_size
+    )
+    seconds = time.perf_counter() - started
+
+    found = total = 0
+    for (signals, _), expected in zip(results, reference):
+        contents = {s.get("content") for s in signals or [] if isinstance(s, dict)}
+        found += len(contents & expected)
+        total += len(expected)
+    main_stats, fast_stats = main_model.stats(), fast_model.stats()
+    return {
+        "seconds": round(seconds, 3),
+        "main_model_calls": main_stats["model_calls"],
+        "fast_model_calls": fast_stats["model_calls"],
+        "prompt_tokens": main_stats["prompt_tokens"] + fast_stats["prompt_tokens"],
+        "output_tokens": main_stats["output_tokens"] + fast_stats["output_tokens"],
+        "main_model_tokens": main_stats["prompt_tokens"] + main_stats["output_tokens"],
+        "chunks_escalated": telemetry.counters.get("chunks_escalated", 0),
+        "chunks_reextracted": telemetry.counters.get("chunks_reextracted", 0),
+        "failed_chunks": sum(error is not None for _, error in results),
+        "recall": round(found / total, 4) if total else None,
+    }
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Compare Phase 1 extraction modes against a fake Gemini backend.")
+    parser.add_argument("--size", default="1M", help="Transcript size, e.g. 100K or 1M (default: 1M).")
+    parser.add_argument("--pack-sizes", type=int, nargs="+", default=[4], help="Pack sizes to compare (default: 4).")
+    parser.add_argument("--latency", default="lognormal:0.2:0.3", help="Main model per-call latency (default: lognormal:0.2:0.3).")
+    parser.add_argument("--fast-latency", default="lognormal:0.05:0.3", help="Fast model per-call latency (default: lognormal:0.05:0.3).")
+    parser.add_argument("--seconds-per-1k-output-tokens", type=float, default=0.2, help="Main model generation time (default: 0.2).")
+    parser.add_argument("--fast-seconds-per-1k-output-tokens", type=float, default=0.05, help="Fast model generation time (default: 0.05).")
+    parser.add_argument("--main-recall", type=float, default=1.0, help="Share of true signals the main model returns (default: 1.0).")
+    parser.add_argument("--fast-recall", type=float, default=0.9, help="Share of true signals the fast model returns (default: 0.9).")
+    parser.add_argument("--fast-sparse-rate", type=float, default=0.05, help="Chance the fast model answers sparsely (default: 0.05).")
+    parser.add_argument("--fast-invalid-json-rate", type=float, default=0.03, help="Chance the fast model truncates its JSON (default: 0.03).")
+    parser.add_argument("--pack-recall-penalty", type=float, default=0.01, help="Recall lost per extra chunk in a pack (default: 0.01).")
+    parser.add_argument("--max-workers", type=int, default=8, help="Phase 1 concurrency (default: 8).")
+    parser.add_argument("--requests-per-minute", type=float, default=1e9, help="Rate limit (default: unlimited).")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write JSON results here (default: stdout).")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    chunks = get_text_chunks(generate_transcript(parse_size(args.size), seed=args.seed))
+    reference = reference_contents(chunks, args)
+
+    modes = [("main_only", False, 1), ("cascade", True, 1)]
+    for pack_size in args.pack_sizes:
+        modes += [(f"packed_{pack_size}", False, pack_size), (f"cascade_packed_{pack_size}", True, pack_size)]
+    results = {}
+    for name, cascade, pack_size in modes:
+        results[name] = run_mode(chunks, reference, args, cascade, pack_size)
+        print(f"{name:>18}: " + ", ".join(f"{k}={v}" for k, v in results[name].items()), file=sys.stderr)
+
+    report = {"revision": git_revision(), "chunks": len(chunks), "settings": vars(args), "modes": results}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,230 @@
+# benchmarks/fake_gemini.py
+"""
+Deterministic, offline stand-in for `genai.GenerativeModel`.
+
+It answers the pipeline's prompts with realistic payloads: `extracted_signals` JSON built
+from the chunk's own sentences and speakers (per chunk for packed prompts), consolidated
+signal lists for reduction batches, and a Markdown PRD of configurable size (optionally
+streamed). Response content depends only on the seed and the prompt, so runs are
+reproducible regardless of thread scheduling. Latency, error rate and output sizes are
+configurable, and so is extraction quality: every model with the same seed draws the same
+"true" signals for a chunk, then keeps each with probability `recall` (lowered per extra
+chunk in a pack by `pack_recall_penalty`), answers sparsely with probability `sparse_rate`
+and returns truncated JSON with probability `invalid_json_rate`.
+"""
+
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+
+from google.api_core import exceptions as google_exceptions
+
+from pipeline import SENTENCE_BOUNDARY_PATTERN, SPEAKER_TURN_PATTERN, estimate_tokens
+
+SIGNAL_CATEGORIES = (
+    "Explicit_Requirement", "Implicit_Requirement", "Technical_Specification", "UI_UX_Detail",
+    "Decision_Made", "Action_Item", "User_Pain_Point", "Business_Goal", "Open_Question", "Identified_Risk",
+)
+PRIORITIES = ("High", "Medium", "Low")
+CHUNK_SECTION_PATTERN = re.compile(r"^---TRANSCRIPT CHUNK( \d+|)---\n(.*?)\n---TRANSCRIPT CHUNK\1---$", re.M | re.S)
+
+
+class LatencyDistribution:
+    """
+    Per-call latency in seconds. `kind` is "fixed" (always `mean`), "uniform" (mean ± spread)
+    or "lognormal" (median `mean`, shape `spread`). `scale` multiplies every sample.
+    """
+
+    def __init__(self, kind="fixed", mean=0.0, spread=0.0, scale=1.0):
+        if kind not in ("fixed", "uniform", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {kind}")
+        self.kind = kind
+        self.mean = mean
+        self.spread = spread
+        self.scale = scale
+
+    @classmethod
+    def parse(cls, spec):
+        """Parses "kind:mean[:spread]", e.g. "lognormal:0.8:0.5" or "fixed:0.05"."""
+        kind, *numbers = spec.split(":")
+        return cls(kind, *(float(n) for n in numbers))
+
+    def sample(self, rng):
+        if self.kind == "fixed":
+            value = self.mean
+        elif self.kind == "uniform":
+            value = rng.uniform(self.mean - self.spread, self.mean + self.spread)
+        else:
+            value = rng.lognormvariate(0, self.spread) * self.mean
+        return max(0.0, value) * self.scale
+
+    def describe(self):
+        return f"{self.kind}:{self.mean}:{self.spread}"
+
+
+class FakeResponse:
+    """Mimics the parts of a Gemini response the pipeline reads: `.text` and `.usage_metadata`."""
+
+    def __init__(self, text, prompt_tokens=0, output_tokens=0):
+        self.text = text
+        self.usage_metadata = SimpleNamespace(
+            prompt_token_count=prompt_tokens,
+            candidates_token_count=output_tokens,
+            total_token_count=prompt_tokens + output_tokens
+        )
+
+
+class FakeGenerativeModel:
+    """Drop-in for `genai.GenerativeModel.generate_content` that never touches the network."""
+
+    def __init__(self, model_name="fake-gemini", latency=None, error_rate=0.0, signals_per_chunk=(4, 12),
+                 reduction_ratio=0.6, prd_chars=20000, stream_piece_chars=400, seed=0, recall=1.0, sparse_rate=0.0,
+                 invalid_json_rate=0.0, pack_recall_penalty=0.0, seconds_per_1k_output_tokens=0.0):
+        self.model_name = model_name
+        self.latency = latency or LatencyDistribution()
+        self.error_rate = error_rate
+        self.recall = recall
+        self.sparse_rate = sparse_rate
+        self.invalid_json_rate = invalid_json_rate
+        self.pack_recall_penalty = pack_recall_penalty
+        self.seconds_per_1k_output_tokens = seconds_per_1k_output_tokens
+        self.signals_per_chunk = signals_per_chunk
+        self.reduction_ratio = reduction_ratio
+        self.prd_chars = prd_chars
+        self.stream_piece_chars = stream_piece_chars
+        self.seed = seed
+        self._call_rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        """Zeroes the call and token counters."""
+        self.calls = 0
+        self.errors = 0
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+
+    def stats(self):
+        return {
+            "model_calls": self.calls,
+            "injected_errors": self.errors,
+            "prompt_tokens": self.prompt_tokens,
+            "output_tokens": self.output_tokens,
+        }
+
+    def _prompt_rng(self, prompt_text):
+        digest = hashlib.sha256(f"{self.seed}\0{prompt_text}".encode("utf-8")).digest()
+        return random.Random(int.from_bytes(digest[:8], "big"))
+
+    def generate_content(self, prompt_parts, generation_config=None, stream=False, **kwargs):
+        parts = [prompt_parts] if isinstance(prompt_parts, str) else list(prompt_parts)
+        prompt_text = "".join(parts)
+        prompt_tokens = estimate_tokens(prompt_text)
+
+        # Latency and injected errors vary per call; the response content depends only on the prompt.
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += prompt_tokens
+            delay = self.latency.sample(self._call_rng)
+            fail = self._call_rng.random() < self.error_rate
+            if fail:
+                self.errors += 1
+
+        rng = self._prompt_rng(prompt_text)
+        if (generation_config or {}).get("response_mime_type") == "application/json":
+            text = self._reduce(parts[-1], rng) if len(parts) > 1 else self._extract(prompt_text, rng)
+        else:
+            text = self._prd(rng)
+        output_tokens = estimate_tokens(text)
+
+        time.sleep(delay + output_tokens / 1000 * self.seconds_per_1k_output_tokens)
+        if fail:
+            raise google_exceptions.ServiceUnavailable("Injected fake backend error")
+        with self._lock:
+            self.output_tokens += output_tokens
+        if not stream:
+            return FakeResponse(text, prompt_tokens, output_tokens)
+        return self._stream(text, prompt_tokens, output_tokens)
+
+    def _stream(self, text, prompt_tokens, output_tokens):
+        for start in range(0, len(text), self.stream_piece_chars):
+            last = start + self.stream_piece_chars >= len(text)
+            yield FakeResponse(
+                text[start:start + self.stream_piece_chars],
+                prompt_tokens if last else 0,
+                output_tokens if last else 0
+            )
+
+    def _extract(self, prompt_text, rng):
+        sections = CHUNK_SECTION_PATTERN.findall(prompt_text)
+        if len(sections) > 1 or (sections and sections[0][0]):
+            text = json.dumps({"chunks": [
+                {"chunk": number, "extracted_signals": self._chunk_signals(chunk_text, len(sections))}
+                for number, (_, chunk_text) in enumerate(sections, start=1)
+            ]})
+        else:
+            text = json.dumps({"extracted_signals": self._chunk_signals(sections[0][1] if sections else prompt_text, 1)})
+        if rng.random() < self.invalid_json_rate:
+            return text[:len(text) // 2]
+        return text
+
+    def _chunk_signals(self, chunk_text, pack_size):
+        # The "true" signals depend only on the chunk; what this model returns of them on its own quality.
+        rng = self._prompt_rng(chunk_text)
+        quality_rng = self._prompt_rng(f"{self.model_name}\0{pack_size}\0{chunk_text}")
+        sentences, speaker = [], "Unknown"
+        for line in chunk_text.splitlines():
+            match = SPEAKER_TURN_PATTERN.match(line)
+            if match:
+                speaker = (match.group("bracket") or match.group("name")).strip()
+                line = line[match.end():]
+            sentences.extend((speaker, s.strip()) for s in SENTENCE_BOUNDARY_PATTERN.split(line) if len(s.strip()) > 20)
+
+        count = rng.randint(*self.signals_per_chunk)
+        picked = rng.sample(sentences, min(count, len(sentences))) if sentences else []
+        signals = [
+            {
+                "category": rng.choice(SIGNAL_CATEGORIES),
+                "speaker": sentence_speaker,
+                "content": sentence[:300],
+                "priority_signal": rng.choice(PRIORITIES),
+            }
+            for sentence_speaker, sentence in picked
+        ]
+        if quality_rng.random() < self.sparse_rate:
+            return signals[:1]
+        recall = self.recall - self.pack_recall_penalty * (pack_size - 1)
+        return [signal for signal in signals if quality_rng.random() < recall]
+
+    def _reduce(self, signals_json, rng):
+        try:
+            signals = json.loads(signals_json)["all_extracted_signals"]
+        except (ValueError, KeyError, TypeError):
+            signals = []
+        keep = max(1, int(len(signals) * self.reduction_ratio)) if signals else 0
+        return json.dumps({"extracted_signals": rng.sample(signals, keep)})
+
+    def _prd(self, rng):
+        sections = [
+            "# PRD: Lighthouse Platform - Benchmark Feature\n---\n## 1. Strategic Overview\n"
+            "- **Feature Name:** Benchmark Feature\n- **Business Goal:** Measure the pipeline.\n---\n",
+        ]
+        size = len(sections[0])
+        requirement = 1
+        while size < self.prd_chars:
+            section = (
+                f"### Requirement: Generated requirement {requirement}\n"
+                f"- **User Story:** As a user I want capability {rng.randint(1, 999)} so that I can finish my task.\n"
+                f"- **Priority:** {rng.choice(PRIORITIES)}\n"
+                "- **Acceptance Criteria:**\n    - [ ] The behaviour is verified end to end.\n\n"
+                "| Discipline | Task Description | Notes |\n|------------|------------------|-------|\n"
+                f"| Backend | Implement endpoint {rng.randint(1, 99)} | None |\n\n---\n"
+            )
+            sections.append(section)
+            size += len(section)
+            requirement += 1
+        return "".join(sections)[:self.prd_chars]
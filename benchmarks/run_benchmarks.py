@@ -0,0 +1,364 @@
+# benchmarks/run_benchmarks.py
+"""
+Offline throughput benchmarks for the pipeline, backed by FakeGenerativeModel.
+
+For each corpus size it measures .txt decoding, .docx extraction (whole-text and
+streaming), chunking, JSON signal parsing, duplicate-signal merging and the end-to-end
+transcript pipeline, reporting wall time, peak traced memory, model calls and tokens sent. The incremental
+stage re-runs the pipeline on revised transcripts, with and without content-defined chunking,
+to show how much Phase 1 work each saves through the response cache. A concurrency sweep runs Phase 1 over a fixed set of chunks at several
+worker counts under randomized latency, checking that results come back in chunk order and
+that speedup stays near-linear up to the concurrency cap; the run exits non-zero if either
+property breaks. Results are written as JSON so runs can be compared across commits.
+
+Examples:
+    python -m benchmarks.run_benchmarks --sizes 10K 1M 15M --output bench.json
+    python -m benchmarks.run_benchmarks --compare baseline.json bench.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from benchmarks.corpus import DEFAULT_SIZES, generate_docx, generate_transcript, revise_transcript
+from benchmarks.fake_gemini import FakeGenerativeModel, LatencyDistribution
+from signal_store import SignalStore
+from pipeline import (
+    MAX_CONCURRENT_REQUESTS,
+    CHUNK_ANALYSIS_PROMPT,
+    RateLimiter,
+    ResponseCache,
+    analyze_chunk,
+    analyze_chunks_concurrently,
+    get_text_chunks,
+    get_text_from_docx,
+    iter_docx_text,
+    parse_signals,
+    process_long_transcript,
+)
+
+SIZE_SUFFIXES = {"K": 1024, "M": 1024 * 1024}
+
+
+def parse_size(text):
+    """Parses "10K", "1.5M" or a plain byte count."""
+    text = text.strip().upper()
+    if text[-1] in SIZE_SUFFIXES:
+        return int(float(text[:-1]) * SIZE_SUFFIXES[text[-1]])
+    return int(text)
+
+def measure(func, track_memory=True, before_each=None, repeat=1):
+    """
+    Runs `func` `repeat` times and keeps the best wall time and, if `track_memory`, once more under
+    tracemalloc for peak memory (tracing distorts timing, so the runs are separate). Returns (result, metrics).
+    """
+    metrics = {}
+    if track_memory:
+        if before_each:
+            before_each()
+        tracemalloc.start()
+        func()
+        metrics["peak_memory_bytes"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    best = None
+    for _ in range(max(1, repeat)):
+        if before_each:
+            before_each()
+        started = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    metrics["seconds"] = round(best, 6)
+    return result, metrics
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def bench_size(size_bytes, args):
+    """Benchmarks every stage on one corpus size. Returns the result record."""
+    transcript = generate_transcript(size_bytes, seed=args.seed)
+    raw_bytes = transcript.encode("utf-8")
+    docx_bytes = generate_docx(size_bytes, seed=args.seed)
+    model = FakeGenerativeModel(
+        latency=LatencyDistribution.parse(args.latency),
+        error_rate=args.error_rate,
+        signals_per_chunk=(args.min_signals, args.max_signals),
+        prd_chars=args.prd_chars,
+        seed=args.seed
+    )
+    track_memory = not args.no_memory
+    stages = {}
+
+    repeat = args.repeat
+    _, stages["decode_txt"] = measure(lambda: raw_bytes.decode("utf-8"), track_memory, repeat=repeat)
+    _, stages["docx_extraction"] = measure(lambda: get_text_from_docx(docx_bytes), track_memory, repeat=repeat)
+    # Streaming straight into the chunker, without materializing the document text first.
+    _, stages["docx_streaming_scan"] = measure(
+        lambda: sum(1 for _ in iter_docx_text(docx_bytes)), track_memory, repeat=repeat
+    )
+    _, stages["docx_streaming_chunking"] = measure(
+        lambda: get_text_chunks(iter_docx_text(docx_bytes)), track_memory, repeat=repeat
+    )
+    chunks, stages["chunking"] = measure(lambda: get_text_chunks(transcript), track_memory, repeat=repeat)
+
+    # Parse realistic responses without paying fake latency for them.
+    instant_model = FakeGenerativeModel(signals_per_chunk=(args.min_signals, args.max_signals), seed=args.seed)
+    responses = [
+        instant_model.generate_content(CHUNK_ANALYSIS_PROMPT.format(chunk_text=chunk),
+                                       generation_config={"response_mime_type": "application/json"}).text
+        for chunk in chunks
+    ]
+    parsed, stages["signal_parsing"] = measure(lambda: [parse_signals(r) for r in responses], track_memory, repeat=repeat)
+
+    def merge_signals():
+        store = SignalStore()
+        for chunk_id, signals in enumerate(parsed, start=1):
+            store.add_many(signals or [], chunk_id)
+        return store
+    store, stages["signal_merging"] = measure(merge_signals, track_memory, repeat=repeat)
+    stages["signal_merging"].update(store.stats())
+
+    warnings = []
+    prd, stages["end_to_end"] = measure(
+        lambda: process_long_transcript(
+            model,
+            transcript,
+            on_warning=warnings.append,
+            rate_limiter=RateLimiter(args.requests_per_minute),
+            max_workers=args.max_workers
+        ),
+        track_memory and not args.no_end_to_end_memory,
+        before_each=model.reset_stats,
+        repeat=repeat
+    )
+    stages["end_to_end"].update(model.stats())
+    stages["end_to_end"]["skipped_chunks"] = len(warnings)
+    stages["end_to_end"]["prd_chars"] = len(prd or "")
+    stages["incremental_rerun"] = bench_incremental(model, transcript, args)
+
+    return {
+        "size_bytes": size_bytes,
+        "transcript_chars": len(transcript),
+        "docx_bytes": len(docx_bytes),
+        "chunks": len(chunks),
+        "signals": sum(len(p or []) for p in parsed),
+        "stages": stages,
+    }
+
+def bench_incremental(model, transcript, args):
+    """
+    Measures re-analysis of two revisions of `transcript`, one with `--revision-fraction` of its turns
+    replaced and one with that many turns inserted, in the default (greedy) chunking mode and in
+    incremental mode. Each mode first analyzes the original into a fresh response cache, which is
+    restored before every rerun, so the greedy-plus-cache reruns are the reference incremental mode
+    has to beat. The stage's `seconds` is the incremental rerun of the replaced revision.
+    """
+    revisions = {
+        "replaced": revise_transcript(transcript, args.revision_fraction, seed=args.seed + 1),
+        "inserted": revise_transcript(transcript, args.revision_fraction, seed=args.seed + 1, insert=True),
+    }
+    cache_dir = tempfile.mkdtemp(prefix="prd_bench_cache_")
+    metrics = {}
+    try:
+        baseline_path = os.path.join(cache_dir, "baseline.sqlite3")
+        run_path = os.path.join(cache_dir, "run.sqlite3")
+
+        def run(text, incremental, cache_path):
+            return process_long_transcript(model, text, cache=ResponseCache(cache_path),
+                                           rate_limiter=RateLimiter(args.requests_per_minute),
+                                           max_workers=args.max_workers, incremental=incremental)
+
+        def restore():
+            shutil.copyfile(baseline_path, run_path)
+            model.reset_stats()
+
+        for mode, incremental in (("default", False), ("incremental", True)):
+            for path in (baseline_path, run_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            model.reset_stats()
+            run(transcript, incremental, baseline_path)
+            calls = {"first_run_model_calls": model.calls}
+            for kind, revision in revisions.items():
+                _, timing = measure(lambda: run(revision, incremental, run_path), track_memory=False,
+                                    before_each=restore, repeat=args.repeat)
+                calls[f"{kind}_rerun_model_calls"] = model.calls
+                if incremental and kind == "replaced":
+                    metrics.update(timing)
+            metrics[mode] = calls
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    for kind in revisions:
+        reference = metrics["default"][f"{kind}_rerun_model_calls"]
+        metrics[f"{kind}_call_ratio"] = (
+            round(metrics["incremental"][f"{kind}_rerun_model_calls"] / reference, 3) if reference else None
+        )
+    return metrics
+
+def bench_concurrency(args):
+    """
+    Runs Phase 1 over the same `--sweep-chunks` chunks once per worker count in `--sweep-workers`,
+    with randomized per-call latency so chunks complete out of order. Each level reports its wall
+    time, speedup over the smallest worker count, parallel efficiency (speedup divided by the ideal
+    one) and whether every result matches a sequential reference extraction of the same chunk.
+    """
+    chunks = get_text_chunks(generate_transcript(parse_size(args.sweep_size), seed=args.seed))[:args.sweep_chunks]
+    reference_model = FakeGenerativeModel(signals_per_chunk=(args.min_signals, args.max_signals), seed=args.seed)
+    reference = [analyze_chunk(reference_model, chunk) for chunk in chunks]
+
+    levels = {}
+    baseline_seconds = baseline_parallelism = None
+    for workers in sorted(set(args.sweep_workers)):
+        model = FakeGenerativeModel(
+            latency=LatencyDistribution.parse(args.sweep_latency),
+            signals_per_chunk=(args.min_signals, args.max_signals),
+            seed=args.seed
+        )
+        started = time.perf_counter()
+        results = analyze_chunks_concurrently(
+            model, chunks, max_workers=workers, rate_limiter=RateLimiter(args.requests_per_minute, burst=workers)
+        )
+        seconds = time.perf_counter() - started
+        parallelism = min(workers, len(chunks))
+        baseline_seconds = baseline_seconds or seconds
+        baseline_parallelism = baseline_parallelism or parallelism
+        speedup = baseline_seconds / seconds
+        levels[str(workers)] = {
+            "seconds": round(seconds, 6),
+            "speedup": round(speedup, 3),
+            "efficiency": round(speedup * baseline_parallelism / parallelism, 3),
+            "in_order": [signals for signals, _ in results] == reference,
+            "failed_chunks": sum(error is not None for _, error in results),
+        }
+    return {"chunks": len(chunks), "latency": args.sweep_latency, "levels": levels}
+
+def check_concurrency(sweep, min_efficiency):
+    """Returns a list of problems with a concurrency sweep: out-of-order results or efficiency below `min_efficiency`."""
+    problems = []
+    for workers, level in sweep["levels"].items():
+        if not level["in_order"]:
+            problems.append(f"{workers} workers: results are not in chunk order")
+        if level["failed_chunks"]:
+            problems.append(f"{workers} workers: {level['failed_chunks']} chunks failed")
+        if level["efficiency"] < min_efficiency:
+            problems.append(f"{workers} workers: parallel efficiency {level['efficiency']} is below {min_efficiency}")
+    return problems
+
+def compare(baseline_path, current_path, threshold, min_seconds):
+    """
+    Prints per-stage time ratios between two result files. Returns 1 if any stage slower than
+    `min_seconds` regressed past `threshold` (faster stages are too noisy to judge).
+    """
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {r["size_bytes"]: r for r in json.load(f)["results"]}
+    with open(current_path, encoding="utf-8") as f:
+        current = json.load(f)["results"]
+
+    regressed = False
+    for record in current:
+        base = baseline.get(record["size_bytes"])
+        if not base:
+            continue
+        for stage, metrics in record["stages"].items():
+            base_seconds = base["stages"].get(stage, {}).get("seconds")
+            if not base_seconds:
+                continue
+            ratio = metrics["seconds"] / base_seconds
+            noisy = max(base_seconds, metrics["seconds"]) < min_seconds
+            flag = "  REGRESSION" if ratio > 1 + threshold and not noisy else ""
+            regressed = regressed or bool(flag)
+            print(f"{record['size_bytes']:>10} {stage:<16} {base_seconds:>10.4f}s -> {metrics['seconds']:>10.4f}s  x{ratio:.2f}{flag}")
+    return 1 if regressed else 0
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the PRD pipeline against a fake Gemini backend.")
+    parser.add_argument("--sizes", nargs="+", default=[str(s) for s in DEFAULT_SIZES],
+                        help="Corpus sizes, e.g. 10K 1M 15M (default: 10K to 15M).")
+    parser.add_argument("--latency", default="lognormal:0.05:0.5",
+                        help='Fake per-call latency "kind:mean[:spread]" with kind fixed/uniform/lognormal (default: lognormal:0.05:0.5).')
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of fake calls that raise a transient error.")
+    parser.add_argument("--min-signals", type=int, default=4, help="Minimum signals returned per chunk.")
+    parser.add_argument("--max-signals", type=int, default=12, help="Maximum signals returned per chunk.")
+    parser.add_argument("--prd-chars", type=int, default=20000, help="Size of the fake PRD.")
+    parser.add_argument("--max-workers", type=int, default=MAX_CONCURRENT_REQUESTS, help="Phase 1 concurrency.")
+    parser.add_argument("--requests-per-minute", type=float, default=1e9, help="Rate limit for the fake backend (default: unlimited).")
+    parser.add_argument("--revision-fraction", type=float, default=0.05,
+                        help="Share of turns replaced or inserted in the incremental re-run stage (default: 0.05).")
+    parser.add_argument("--sweep-workers", type=int, nargs="+", default=[1, 2, 4, MAX_CONCURRENT_REQUESTS],
+                        help=f"Worker counts for the concurrency sweep (default: 1 2 4 {MAX_CONCURRENT_REQUESTS}).")
+    parser.add_argument("--sweep-size", default="1M", help="Corpus size the sweep takes its chunks from (default: 1M).")
+    parser.add_argument("--sweep-chunks", type=int, default=32, help="Chunks analyzed at each sweep level (default: 32).")
+    parser.add_argument("--sweep-latency", default="uniform:0.1:0.05",
+                        help="Fake per-call latency during the sweep (default: uniform:0.1:0.05).")
+    parser.add_argument("--min-parallel-efficiency", type=float, default=0.6,
+                        help="Sweep levels below this speedup / workers ratio fail the run (default: 0.6).")
+    parser.add_argument("--no-sweep", action="store_true", help="Skip the concurrency sweep.")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per stage; the best is reported (default: 3).")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc passes.")
+    parser.add_argument("--no-end-to-end-memory", action="store_true", help="Skip the tracemalloc pass for the end-to-end stage only.")
+    parser.add_argument("--output", help="Write JSON results here (default: stdout).")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"), help="Compare two result files instead of running.")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed slowdown before --compare flags a regression (default: 0.2).")
+    parser.add_argument("--min-seconds", type=float, default=0.005,
+                        help="Stages faster than this are not flagged by --compare (default: 0.005).")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.compare:
+        return compare(*args.compare, args.threshold, args.min_seconds)
+
+    results = []
+    for size in args.sizes:
+        record = bench_size(parse_size(size), args)
+        results.append(record)
+        print(
+            f"{size:>6}: {record['chunks']} chunks, end-to-end {record['stages']['end_to_end']['seconds']:.2f}s, "
+            f"{record['stages']['end_to_end']['model_calls']} calls",
+            file=sys.stderr
+        )
+
+    sweep, problems = None, []
+    if not args.no_sweep:
+        sweep = bench_concurrency(args)
+        problems = check_concurrency(sweep, args.min_parallel_efficiency)
+        print("Concurrency sweep: " + ", ".join(
+            f"{workers} workers {level['seconds']:.2f}s (x{level['speedup']:.2f})" for workers, level in sweep["levels"].items()
+        ), file=sys.stderr)
+        for problem in problems:
+            print(f"Concurrency sweep FAILED: {problem}", file=sys.stderr)
+
+    report = {
+        "revision": git_revision(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "settings": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+        "results": results,
+        "concurrency_sweep": sweep,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
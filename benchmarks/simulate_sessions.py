@@ -0,0 +1,143 @@
+# benchmarks/simulate_sessions.py
+"""
+Simulates several app sessions sharing one JobScheduler, backed by FakeGenerativeModel.
+
+A few sessions submit large transcripts while others submit small PM-notes jobs a moment
+later. The run reports each job's wait and completion time, the peak number of model calls
+in flight and the tokens charged per minute, once with fair queuing and once with plain
+FIFO admission, so the effect of the fair gate is visible.
+
+Example:
+    python -m benchmarks.simulate_sessions --transcripts 2 --notes 6 --max-concurrent-calls 4
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+
+from benchmarks.corpus import generate_transcript
+from benchmarks.fake_gemini import FakeGenerativeModel, LatencyDistribution
+from benchmarks.run_benchmarks import parse_size
+from scheduler import JobScheduler
+
+
+class ConcurrencyProbe:
+    """Wraps a model to record the peak number of calls in flight."""
+
+    def __init__(self, model):
+        self._model = model
+        self.model_name = model.model_name
+        self.in_flight = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def _enter(self):
+        with self._lock:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+
+    def _exit(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def generate_content(self, prompt_parts, stream=False, **kwargs):
+        if stream:
+            return self._stream(prompt_parts, **kwargs)
+        self._enter()
+        try:
+            return self._model.generate_content(prompt_parts, **kwargs)
+        finally:
+            self._exit()
+
+    def _stream(self, prompt_parts, **kwargs):
+        self._enter()
+        try:
+            yield from self._model.generate_content(prompt_parts, stream=True, **kwargs)
+        finally:
+            self._exit()
+
+def simulate(args, fair):
+    """Runs one scenario. Returns the per-job records and the scheduler-wide totals."""
+    model = ConcurrencyProbe(FakeGenerativeModel(latency=LatencyDistribution.parse(args.latency),
+                                                 prd_chars=args.prd_chars, seed=args.seed))
+    scheduler = JobScheduler(
+        max_concurrent_calls=args.max_concurrent_calls,
+        requests_per_minute=args.requests_per_minute,
+        tokens_per_minute=args.tokens_per_minute,
+        fair=fair
+    )
+    transcript = generate_transcript(parse_size(args.transcript_size), seed=args.seed)
+    notes = generate_transcript(parse_size(args.notes_size), seed=args.seed + 1)
+
+    started = time.perf_counter()
+    jobs = []
+    for i in range(args.transcripts):
+        jobs.append(scheduler.submit_transcript(f"transcript-session-{i}", model, transcript))
+    time.sleep(args.notes_delay)
+    for i in range(args.notes):
+        jobs.append(scheduler.submit_pm_notes(f"notes-session-{i}", model, notes))
+        time.sleep(args.notes_interval)
+    while not all(job.done for job in jobs):
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - started
+    stats = scheduler.stats()
+    scheduler.shutdown()
+
+    records = [
+        {
+            "session": job.session_id,
+            "kind": job.kind,
+            "status": job.status,
+            "wait_seconds": round(job.started - job.submitted, 3),
+            "seconds": round(job.finished - job.submitted, 3),
+        }
+        for job in jobs
+    ]
+    totals = {
+        "elapsed_seconds": round(elapsed, 3),
+        "peak_calls_in_flight": model.peak,
+        "model_calls": stats["calls_admitted"],
+        "tokens_per_minute": round(stats["tokens_charged"] / elapsed * 60),
+    }
+    for kind in ("transcript", "pm_notes"):
+        seconds = sorted(r["seconds"] for r in records if r["kind"] == kind)
+        if seconds:
+            totals[f"{kind}_mean_seconds"] = round(sum(seconds) / len(seconds), 3)
+            totals[f"{kind}_max_seconds"] = seconds[-1]
+    return records, totals
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate concurrent sessions sharing the job scheduler.")
+    parser.add_argument("--transcripts", type=int, default=2, help="Sessions submitting a large transcript (default: 2).")
+    parser.add_argument("--transcript-size", default="480K", help="Size of each transcript (default: 480K, about 40 chunks).")
+    parser.add_argument("--notes", type=int, default=6, help="Sessions submitting PM notes (default: 6).")
+    parser.add_argument("--notes-size", default="8K", help="Size of each PM-notes document (default: 8K).")
+    parser.add_argument("--notes-delay", type=float, default=0.2, help="Seconds after the transcripts before notes arrive.")
+    parser.add_argument("--notes-interval", type=float, default=0.05, help="Seconds between PM-notes submissions.")
+    parser.add_argument("--latency", default="fixed:0.1", help='Fake per-call latency "kind:mean[:spread]" (default: fixed:0.1).')
+    parser.add_argument("--prd-chars", type=int, default=4000, help="Size of each fake PRD.")
+    parser.add_argument("--max-concurrent-calls", type=int, default=4, help="Global model calls in flight (default: 4).")
+    parser.add_argument("--requests-per-minute", type=float, default=6000, help="Global request budget (default: 6000).")
+    parser.add_argument("--tokens-per-minute", type=float, default=10_000_000, help="Global token budget (default: 10M).")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-fifo", action="store_true", help="Only run the fair scenario.")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = {"settings": vars(args), "scenarios": {}}
+    for name, fair in (("fair", True), ("fifo", False)):
+        if name == "fifo" and args.no_fifo:
+            continue
+        records, totals = simulate(args, fair)
+        report["scenarios"][name] = {"totals": totals, "jobs": records}
+        print(f"{name:>5}: " + ", ".join(f"{k}={v}" for k, v in totals.items()), file=sys.stderr)
+    json.dump(report, sys.stdout, indent=2)
+    print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
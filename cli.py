@@ -0,0 +1,299 @@
+# cli.py
+"""
+Headless batch runner for the AI Requirements Assistant.
+
+Turns a directory (searched recursively) or glob of .txt/.docx documents into one PRD
+Markdown file per input, fanning the documents out across a process pool. Every model
+call from every worker shares one global concurrency cap, and a JSON summary report
+with per-file timings and failures is written next to the PRDs.
+
+Example:
+    GEMINI_API_KEY=... python cli.py archive/transcripts --output-dir prds --workers 4
+"""
+
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import google.generativeai as genai
+
+from telemetry import RunTelemetry, span
+from pipeline import (
+    MAX_CONCURRENT_REQUESTS,
+    MAX_FILE_SIZE_BYTES,
+    MAX_FILE_SIZE_MB,
+    EXTRACTION_MODEL_NAME,
+    MODEL_NAME,
+    PACKED_CHUNKS_PER_REQUEST,
+    REQUESTS_PER_MINUTE,
+    RateLimiter,
+    ResponseCache,
+    RunCheckpoint,
+    get_text_from_docx,
+    process_long_transcript,
+    process_pm_notes,
+)
+
+SUPPORTED_EXTENSIONS = (".txt", ".docx")
+DOCUMENT_TYPES = ("transcript", "notes")
+REPORT_FILE_NAME = "batch_report.json"
+
+
+class BoundedModel:
+    """Wraps a GenerativeModel so that every call holds a slot of a semaphore shared by all workers."""
+
+    def __init__(self, model, semaphore):
+        self._model = model
+        self._semaphore = semaphore
+        self.model_name = getattr(model, "model_name", MODEL_NAME)
+
+    def generate_content(self, prompt_parts, stream=False, **kwargs):
+        if stream:
+            return self._stream(prompt_parts, **kwargs)
+        with self._semaphore:
+            return self._model.generate_content(prompt_parts, **kwargs)
+
+    def _stream(self, prompt_parts, **kwargs):
+        with self._semaphore:
+            yield from self._model.generate_content(prompt_parts, stream=True, **kwargs)
+
+
+def gemini_model_factory(api_key, model_name):
+    """Default model factory: a configured Gemini client."""
+    genai.configure(api_key=api_key)
+    return genai.GenerativeModel(model_name)
+
+
+# Per-process state, set up once by init_worker.
+_worker = {}
+
+def init_worker(model_factory, api_key, model_name, semaphore, requests_per_minute, use_cache, incremental=False,
+                extraction_model_name=None, pack_size=1):
+    """Process-pool initializer: builds this worker's model clients, rate limiter and cache."""
+    _worker["model"] = BoundedModel(model_factory(api_key, model_name), semaphore)
+    _worker["extraction_model"] = (
+        BoundedModel(model_factory(api_key, extraction_model_name), semaphore) if extraction_model_name else None
+    )
+    _worker["pack_size"] = pack_size
+    _worker["rate_limiter"] = RateLimiter(requests_per_minute)
+    _worker["cache"] = ResponseCache() if use_cache else None
+    _worker["use_checkpoints"] = use_cache
+    _worker["incremental"] = use_cache and incremental
+
+def collect_inputs(patterns):
+    """Expands directories and glob patterns into a sorted, de-duplicated list of supported files."""
+    paths = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for root, _, files in os.walk(pattern):
+                paths.update(os.path.join(root, name) for name in files)
+        else:
+            paths.update(glob.glob(pattern, recursive=True))
+    return sorted(p for p in paths if os.path.isfile(p) and p.lower().endswith(SUPPORTED_EXTENSIONS))
+
+def plan_outputs(input_paths, output_dir):
+    """Maps each input to `<output_dir>/<stem>.md`, suffixing repeated stems so no PRD overwrites another."""
+    planned, taken = {}, set()
+    for path in input_paths:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        name, counter = f"{stem}.md", 2
+        while name in taken:
+            name, counter = f"{stem}_{counter}.md", counter + 1
+        taken.add(name)
+        planned[path] = os.path.join(output_dir, name)
+    return planned
+
+def read_document(path, telemetry=None):
+    """Reads a .txt or .docx file into text, enforcing the app's upload size limit."""
+    size = os.path.getsize(path)
+    if size > MAX_FILE_SIZE_BYTES:
+        raise ValueError(f"File size exceeds the {MAX_FILE_SIZE_MB}MB limit.")
+    if path.lower().endswith(".docx"):
+        with span(telemetry, "docx_extraction", bytes=size):
+            return get_text_from_docx(path)
+    with span(telemetry, "file_decode", bytes=size), open(path, "rb") as f:
+        return f.read().decode("utf-8")
+
+def process_file(input_path, output_path, document_type):
+    """Generates the PRD for one document inside a worker process. Returns a report record."""
+    record = {"input": input_path, "output": output_path, "status": "failed", "error": None, "warnings": [], "timings": {}}
+    started = time.perf_counter()
+    telemetry = RunTelemetry()
+    try:
+        text = read_document(input_path, telemetry)
+        if not text.strip():
+            raise ValueError("The document appears to be empty.")
+
+        if document_type == "transcript":
+            errors = []
+            prd = process_long_transcript(
+                _worker["model"],
+                text,
+                cache=_worker["cache"],
+                timings=record["timings"],
+                checkpoint=RunCheckpoint.for_document(text) if _worker["use_checkpoints"] else None,
+                incremental=_worker["incremental"],
+                on_warning=record["warnings"].append,
+                on_error=errors.append,
+                rate_limiter=_worker["rate_limiter"],
+                telemetry=telemetry,
+                extraction_model=_worker["extraction_model"],
+                pack_size=_worker["pack_size"]
+            )
+            if not prd:
+                raise ValueError(errors[0] if errors else "No PRD was generated.")
+        else:
+            prd = process_pm_notes(
+                _worker["model"],
+                text,
+                cache=_worker["cache"],
+                timings=record["timings"],
+                rate_limiter=_worker["rate_limiter"],
+                telemetry=telemetry
+            )
+
+        with open(output_path, "w", encoding="utf-8") as f:
+            f.write(prd)
+        record["status"] = "ok"
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+        record["traceback"] = traceback.format_exc()
+    record["seconds"] = round(time.perf_counter() - started, 3)
+    record["usage"] = telemetry.totals()
+    record["spans"] = telemetry.summary()
+    return record
+
+def run_batch(input_paths, output_dir, document_type="transcript", workers=4,
+              max_concurrent_calls=MAX_CONCURRENT_REQUESTS, requests_per_minute=REQUESTS_PER_MINUTE,
+              use_cache=True, skip_existing=False, api_key=None, model_name=MODEL_NAME,
+              model_factory=gemini_model_factory, on_file_done=None, incremental=False,
+              extraction_model_name=EXTRACTION_MODEL_NAME, pack_size=PACKED_CHUNKS_PER_REQUEST):
+    """
+    Processes every input on a pool of `workers` processes and writes the summary report.
+    `max_concurrent_calls` caps model calls in flight across all workers; `requests_per_minute`
+    is split evenly between workers. With `incremental`, transcripts are chunked at content-defined
+    boundaries, so a later run on a revised version only sends its changed parts to the model (the
+    rest hit the response cache), at the cost of some extra chunks. Transcript chunks are extracted
+    by `extraction_model_name` (escalating to `model_name`; None to use `model_name` only), up to
+    `pack_size` chunks per request. Returns the report dict.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    planned = plan_outputs(input_paths, output_dir)
+    records = []
+    if skip_existing:
+        for path, output_path in list(planned.items()):
+            if os.path.exists(output_path):
+                records.append({"input": path, "output": output_path, "status": "skipped", "error": None, "seconds": 0.0})
+                del planned[path]
+
+    started_at = datetime.now().isoformat(timespec="seconds")
+    started = time.perf_counter()
+    workers = max(1, min(workers, len(planned) or 1))
+    with multiprocessing.Manager() as manager, ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=init_worker,
+        initargs=(model_factory, api_key, model_name, manager.BoundedSemaphore(max_concurrent_calls),
+                  requests_per_minute / workers, use_cache, incremental, extraction_model_name, pack_size)
+    ) as executor:
+        futures = {
+            executor.submit(process_file, path, output_path, document_type): path
+            for path, output_path in planned.items()
+        }
+        for future in as_completed(futures):
+            try:
+                record = future.result()
+            except Exception as e:  # The worker process itself died.
+                path = futures[future]
+                record = {"input": path, "output": planned[path], "status": "failed", "error": f"{type(e).__name__}: {e}", "seconds": None}
+            records.append(record)
+            if on_file_done:
+                on_file_done(record, len(records), len(input_paths))
+
+    records.sort(key=lambda r: r["input"])
+    report = {
+        "started": started_at,
+        "total_seconds": round(time.perf_counter() - started, 3),
+        "document_type": document_type,
+        "workers": workers,
+        "max_concurrent_calls": max_concurrent_calls,
+        "succeeded": sum(r["status"] == "ok" for r in records),
+        "skipped": sum(r["status"] == "skipped" for r in records),
+        "failed": sum(r["status"] == "failed" for r in records),
+        "files": records,
+    }
+    with open(os.path.join(output_dir, REPORT_FILE_NAME), "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    return report
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a PRD (.md) for every .txt/.docx document in a directory or glob.")
+    parser.add_argument("inputs", nargs="+", help="Directories (searched recursively) and/or glob patterns of .txt/.docx files.")
+    parser.add_argument("-o", "--output-dir", default="prds", help="Where to write the PRDs and the summary report (default: prds).")
+    parser.add_argument("-t", "--type", dest="document_type", choices=DOCUMENT_TYPES, default="transcript",
+                        help="Treat inputs as meeting transcripts or PM notes (default: transcript).")
+    parser.add_argument("-w", "--workers", type=int, default=4, help="Number of worker processes (default: 4).")
+    parser.add_argument("--max-concurrent-calls", type=int, default=MAX_CONCURRENT_REQUESTS,
+                        help=f"Model calls in flight across all workers (default: {MAX_CONCURRENT_REQUESTS}).")
+    parser.add_argument("--requests-per-minute", type=float, default=REQUESTS_PER_MINUTE,
+                        help=f"Model calls per minute across all workers (default: {REQUESTS_PER_MINUTE}).")
+    parser.add_argument("--model", default=MODEL_NAME, help=f"Gemini model name (default: {MODEL_NAME}).")
+    parser.add_argument("--extraction-model", default=EXTRACTION_MODEL_NAME,
+                        help=f'Faster model for transcript chunk extraction, escalating to --model when its output looks wrong; "" to use --model only (default: {EXTRACTION_MODEL_NAME}).')
+    parser.add_argument("--pack-chunks", type=int, default=PACKED_CHUNKS_PER_REQUEST,
+                        help=f"Transcript chunks bundled into each extraction request (default: {PACKED_CHUNKS_PER_REQUEST}).")
+    parser.add_argument("--no-cache", action="store_true", help="Ignore cached responses and saved progress from earlier runs.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Chunk transcripts so that later runs on revised versions only re-analyze the changed parts (about 10%% more chunks on every run).")
+    parser.add_argument("--skip-existing", action="store_true", help="Skip inputs whose PRD already exists in the output directory.")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    api_key = os.environ.get("GEMINI_API_KEY") or os.environ.get("GOOGLE_API_KEY")
+    if not api_key:
+        print("Set GEMINI_API_KEY (or GOOGLE_API_KEY) to your Google Gemini API key.", file=sys.stderr)
+        return 2
+
+    input_paths = collect_inputs(args.inputs)
+    if not input_paths:
+        print("No .txt or .docx files matched the given inputs.", file=sys.stderr)
+        return 2
+
+    def print_progress(record, done, total):
+        timing = f" in {record['seconds']:.1f}s" if record.get("seconds") is not None else ""
+        detail = f" - {record['error']}" if record.get("error") else ""
+        print(f"[{done}/{total}] {record['status']}: {record['input']}{timing}{detail}", file=sys.stderr)
+
+    report = run_batch(
+        input_paths,
+        args.output_dir,
+        document_type=args.document_type,
+        workers=args.workers,
+        max_concurrent_calls=args.max_concurrent_calls,
+        requests_per_minute=args.requests_per_minute,
+        use_cache=not args.no_cache,
+        skip_existing=args.skip_existing,
+        api_key=api_key,
+        model_name=args.model,
+        on_file_done=print_progress,
+        incremental=args.incremental,
+        extraction_model_name=args.extraction_model or None,
+        pack_size=args.pack_chunks
+    )
+    print(
+        f"Done in {report['total_seconds']:.1f}s: {report['succeeded']} succeeded, {report['skipped']} skipped, "
+        f"{report['failed']} failed. Report: {os.path.join(args.output_dir, REPORT_FILE_NAME)}",
+        file=sys.stderr
+    )
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
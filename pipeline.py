@@ -0,0 +1,1198 @@
+# pipeline.py
+"""
+Streamlit-free core of the AI Requirements Assistant: prompts, chunking, model calls,
+caching, checkpointing and the transcript / PM-notes pipelines. Progress is reported
+through callbacks so the same code runs in the Streamlit app and in the batch CLI.
+"""
+
+from google.api_core import exceptions as google_exceptions
+import contextlib
+import io
+import json
+import hashlib
+import os
+import random
+import shutil
+import sqlite3
+import re 
+import time
+import threading
+import zipfile
+import zlib
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from signal_store import SignalStore
+from telemetry import increment, record_usage, span
+
+# --- Pipeline Constants ---
+MAX_FILE_SIZE_MB = 15
+MAX_FILE_SIZE_BYTES = MAX_FILE_SIZE_MB * 1024 * 1024
+MODEL_NAME = "gemini-2.5-pro" 
+EXTRACTION_MODEL_NAME = "gemini-2.5-flash"   # Phase 1 model; chunks it handles poorly are escalated to MODEL_NAME
+ESCALATION_MIN_SIGNALS_PER_1K_TOKENS = 0.5   # Fewer signals than this per 1K chunk tokens is suspiciously sparse
+PACKED_CHUNKS_PER_REQUEST = 1                # Above 1, up to this many chunks share one extraction request...
+PACKED_REQUEST_TOKEN_BUDGET = 12000          # ...as long as their text stays within this many estimated tokens
+MAX_CONCURRENT_REQUESTS = 8   # Max Phase 1 chunk requests in flight at once
+REQUESTS_PER_MINUTE = 60      # Token-bucket cap on model calls per minute
+TOKENS_PER_MINUTE = 1_000_000 # Prompt + output tokens per minute shared by all app sessions (see scheduler.py)
+CHUNK_TOKEN_BUDGET = 3000     # Estimated tokens of transcript text per Phase 1 chunk
+CDC_ANCHOR_SPACING = 10       # Content-defined cuts fall on average once per this many chunk budgets of text
+SINGLE_SHOT_SYNTHESIS_MAX_TOKENS = 60000   # Above this, signals are reduced hierarchically first
+SIGNAL_BATCH_TOKEN_BUDGET = 15000          # Target size of each batch in the reduction tree
+MAX_RETRY_ATTEMPTS = 5       # Attempts per model call before a transient error is reported
+RETRY_BASE_DELAY_SECONDS = 2.0
+RETRY_MAX_DELAY_SECONDS = 60.0
+RUNS_DIR = ".prd_runs"        # Per-document checkpoints of Phase 1 results
+CACHE_PATH = os.path.join(".prd_cache", "responses.sqlite3")
+CACHE_MAX_BYTES = 200 * 1024 * 1024
+CACHE_TTL_SECONDS = 30 * 24 * 60 * 60
+
+# --- Prompts ---
+
+# --- TRANSCRIPT ANALYSIS PROMPTS (MULTI-PHASE) ---
+
+# Prompt 1A: The Signals Intelligence Chunk Analysis Prompt for transcripts
+EXTRACTION_PREAMBLE = """
+**Persona:**
+You are an AI Signals Intelligence (SIGINT) Analyst. Your sole mission is to meticulously analyze a small, decontextualized snippet of a longer conversation and extract every potential data point without judgment or synthesis. You are a specialist in identifying and categorizing raw information for later analysis by a different system. You are incapable of missing a requirement.
+
+**Primary Directive:**
+You will use a Chain-of-Thought process. For each sentence in the provided transcript chunk, you will first think about what signals are present, and only then will you add them to a final JSON object. Your ONLY output must be a single, valid JSON object. Do not output your thoughts, only the final JSON.
+
+**Core Principles of Extraction:**
+1.  **Deconstruct Every Sentence:** Do not read paragraphs as a whole. Analyze one sentence at a time. A single sentence can contain multiple signals. You must extract all of them.
+2.  **Extract, Do Not Interpret:** Do not summarize or rephrase. Capture the essence of the statement, using direct quotes where possible.
+3.  **No Signal Left Behind:** Your primary goal is to capture everything that *might* be relevant.
+4.  **Attribute to Speaker:** If the text indicates who is speaking (e.g., "Sarah:", "[John]"), you MUST populate the `speaker` field. If it's unclear, use "Unknown". A leading `[Previous speaker: ...]` line is context only, not a statement; text marked "(continued):" belongs to that speaker.
+
+**Signal Categorization Protocol:**
+Categorize every extracted point into ONE of these: `Explicit_Requirement`, `Implicit_Requirement`, `Technical_Specification`, `UI_UX_Detail`, `Decision_Made`, `Action_Item`, `User_Pain_Point`, `Business_Goal`, `Open_Question`, `Identified_Risk`.
+"""
+
+CHUNK_ANALYSIS_PROMPT = EXTRACTION_PREAMBLE + """
+**Required JSON Output Format:**
+```json
+{{
+  "extracted_signals": [
+    {{
+      "category": "ENUM(One of the categories from the protocol above)",
+      "speaker": "STRING",
+      "content": "STRING(The extracted statement or key phrase)",
+      "priority_signal": "ENUM('High', 'Medium', 'Low')"
+    }}
+  ]
+}}
+```
+
+Now, apply this rigorous process to the following transcript chunk.
+
+---TRANSCRIPT CHUNK---
+{chunk_text}
+---TRANSCRIPT CHUNK---
+"""
+
+# Prompt 1A (packed): several chunks in one request, sharing the preamble; the chunks themselves
+# are appended after it, each wrapped in PACKED_CHUNK_DELIMITER lines with its number.
+PACKED_CHUNK_ANALYSIS_PROMPT = EXTRACTION_PREAMBLE + """
+**Required JSON Output Format:**
+Analyze each of the numbered transcript chunks below independently, as if it were the only one. Return one entry per chunk, in order, even if a chunk has no signals:
+```json
+{{
+  "chunks": [
+    {{
+      "chunk": "NUMBER(The chunk number)",
+      "extracted_signals": [
+        {{
+          "category": "ENUM(One of the categories from the protocol above)",
+          "speaker": "STRING",
+          "content": "STRING(The extracted statement or key phrase)",
+          "priority_signal": "ENUM('High', 'Medium', 'Low')"
+        }}
+      ]
+    }}
+  ]
+}}
+```
+
+Now, apply this rigorous process to the following {chunk_count} transcript chunks.
+"""
+PACKED_CHUNK_DELIMITER = "---TRANSCRIPT CHUNK {number}---"
+
+# Prompt 1B: The Master Architect Synthesis Prompt for transcripts
+FINAL_SYNTHESIS_PROMPT = """
+**Persona:**
+You are an AI Master Architect. Your exclusive function is to receive structured, raw intelligence data (in JSON format) and synthesize it into a single, comprehensive, and strategically coherent Product Requirements Document (PRD) formatted for optimal display in systems like Azure DevOps wikis.
+
+**Primary Directive:**
+Your sole input is a list of JSON objects, where each object is an "extracted signal". Your only output must be a single, human-readable PRD formatted in Markdown. You must process **every single signal** from the input and ensure it is appropriately represented in the final document, using markdown tables for clarity where specified in the template.
+
+**Core Principles of Synthesis:**
+1.  **Input is Ground Truth:** The provided JSON data is your only source of information. Do not add requirements not supported by a signal.
+2.  **De-duplicate & Synthesize:** Intelligently merge related signals into a single, cohesive requirement entry in the final PRD.
+3.  **Structure is Paramount:** Follow the PRD template below with absolute precision. Use markdown tables exactly as shown.
+4.  **Follow the Mapping Guide:** Use the protocol to determine where each signal category should be placed in the final document.
+
+**Signal-to-PRD Mapping Protocol:**
+-   **`Explicit_Requirement` / `Implicit_Requirement`:** These form the "Requirement" sections in the Work Breakdown.
+-   **`UI_UX_Detail`:** Translate into FE Tasks or Acceptance Criteria.
+-   **`Technical_Specification`:** Translate into BE Tasks, Acceptance Criteria, or NFRs.
+-   **`User_Pain_Point` / `Business_Goal`:** Use for the Strategic Overview and the "so that I can..." part of user stories.
+-   **`Decision_Made`:** Use to state definitive behavior in Acceptance Criteria.
+-   **`Action_Item` / `Open_Question`:** Convert into line items in the "Open Questions & Action Items" section.
+-   **`Identified_Risk`:** Add to the "Potential Risks" table for the relevant requirement.
+
+**--- PRD TEMPLATE FOR AZURE DEVOPS WIKI ---**
+*Generate the final document using this exact structure.*
+
+# PRD: Lighthouse Platform - [Feature Name]
+---
+## 1. Strategic Overview
+- **Feature Name:** [Synthesize a clear name from the signals]
+- **User "Job to Be Done" (JTBD):** [Synthesize from `User_Pain_Point` and `Implicit_Requirement` signals: "When I [context], I want to [motivation], so I can [expected outcome]."]
+- **Business Goal:** [Synthesize from `Business_Goal` signals.]
+- **Success Metrics:** [Infer potential KPIs from business goals.]
+---
+## 2. Open Questions & Action Items
+*Synthesized directly from `Open_Question` and `Action_Item` signals.*
+- **[ ] Open Question:** [Content of `Open_Question` signal] - **Owner:** [Suggest a role]
+- **[ ] Action Item:** [Content of `Action_Item` signal] - **Owner:** [Suggest a role]
+---
+## 3. Non-Functional Requirements (NFRs)
+*Synthesize from any relevant `Technical_Specification` signals that are global in nature. Format as a markdown table.*
+
+| Category      | Requirement                                                | Metric/Standard                  |
+|---------------|------------------------------------------------------------|----------------------------------|
+| Performance   | [e.g., API Response Time]                                  | [e.g., 95% of responses < 500ms] |
+| Security      | [e.g., Authentication]                                     | [e.g., All endpoints are secured]|
+| Accessibility | [e.g., Keyboard Navigation]                                | [e.g., WCAG 2.1 AA Compliant]    |
+
+---
+## 4. Epic & Work Breakdown Structure
+*A complete deconstruction of the work required, built by mapping all relevant signals.*
+### ### Epic: [Synthesize a high-level Epic title]
+*This epic covers all work required for the discussed feature set.*
+---
+### Requirement: [Title synthesized from one or more `Explicit_Requirement` signals]
+- **User Story:** [Synthesize from signals]
+- **Priority:** [Determine from `priority_signal` values]
+- **Acceptance Criteria:**
+    - [ ] [Synthesize from `UI_UX_Detail`, `Technical_Specification`, and `Decision_Made` signals.]
+    - [ ] [Add another criterion...]
+
+**Implementation Tasks:**
+*Format as a markdown table.*
+| Discipline | Task Description                                       | Notes                  |
+|------------|--------------------------------------------------------|------------------------|
+| Frontend   | [Synthesize from one or more `UI_UX_Detail` signals.]  | [Any additional notes] |
+| Backend    | [Synthesize from one or more `Technical_Specification` signals.] | [Any additional notes] |
+| QA         | [Create a specific task to verify the acceptance criteria.] | [e.g., "End-to-end test"] |
+
+**Potential Risks:**
+*Format as a markdown table.*
+| Risk Category | Description                                         | Mitigation Strategy         |
+|---------------|-----------------------------------------------------|-----------------------------|
+| [e.g., Technical] | [Synthesize from any `Identified_Risk` signals.] | [Suggest a mitigation plan] |
+
+---
+*(Continue this structure for every other requirement identified in the input signals...)*
+"""
+
+# Prompt 1C: The Signal Consolidation Prompt used for hierarchical (map-reduce) synthesis
+SIGNAL_REDUCTION_PROMPT = """
+**Persona:**
+You are an AI Intelligence Consolidation Analyst. You receive one batch of raw "extracted signals" (in JSON format) from a long conversation, and you condense it for a Master Architect who will later write the PRD from many such batches.
+
+**Primary Directive:**
+Merge signals that express the same point into a single signal. Keep every distinct point. Your ONLY output must be a single, valid JSON object in exactly the same schema as the input signals.
+
+**Core Principles of Consolidation:**
+1.  **Lose Nothing:** Every distinct requirement, detail, decision, question, action item or risk in the batch must survive in the output.
+2.  **Merge, Do Not Invent:** Only combine signals that are genuinely about the same thing. Do not add information that is not in the batch.
+3.  **Keep Attribution:** When merging, list every speaker involved, comma-separated, in the `speaker` field.
+4.  **Keep the Strongest Priority:** A merged signal takes the highest `priority_signal` among its sources.
+5.  **Keep Categories:** Only merge signals of the same `category`.
+
+**Required JSON Output Format:**
+```json
+{
+  "extracted_signals": [
+    {
+      "category": "ENUM(Same categories as the input)",
+      "speaker": "STRING",
+      "content": "STRING(The consolidated statement)",
+      "priority_signal": "ENUM('High', 'Medium', 'Low')"
+    }
+  ]
+}
+```
+
+Now, consolidate the following batch of signals.
+"""
+
+
+# --- PM NOTES ANALYSIS PROMPT (SINGLE-PHASE) ---
+PM_NOTES_PROMPT = """
+**Persona:**
+You are an AI Product Strategist. Your expertise is in taking a product manager's rough, unstructured notes and transforming them into a comprehensive, engineering-ready Product Requirements Document (PRD), formatted for optimal display in systems like Azure DevOps wikis.
+
+**Primary Directive:**
+Analyze the provided PM notes. Your goal is to first deconstruct the information and rebuild it into a structured PRD using markdown tables for clarity. After structuring the notes, you will then provide a section with strategic suggestions for improving the feature.
+
+**Core Principles of Interpretation & Analysis:**
+1.  **Structure from Chaos:** Your first job is to impose the PRD structure onto the notes. Group related points into a single requirement.
+2.  **Identify the Gaps:** If the notes are unclear or missing key details, you must create logical, inferred placeholders and flag them in the "Open Questions" section.
+3.  **Be Exhaustive:** Do not discard any point from the notes. Every idea or feature mentioned must be translated into a corresponding section in the PRD.
+4.  **Think Strategically:** In the final "Suggestions" section, think beyond the notes. Consider the user experience, potential edge cases, and future scalability. Provide concrete ideas to make the feature truly excellent.
+
+**--- PRD TEMPLATE FOR AZURE DEVOPS WIKI ---**
+*You must generate the final document using this exact structure.*
+
+# PRD: Lighthouse Platform - [Feature Name]
+---
+## 1. Strategic Overview
+- **Feature Name:** [Determine a clear name from the notes]
+- **User "Job to Be Done" (JTBD):** [Determine from the notes: "When I [context], I want to [motivation], so I can [expected outcome]."]
+- **Business Goal:** [Determine from the notes.]
+- **Success Metrics:** [Infer potential KPIs from the goals.]
+---
+## 2. Open Questions & Action Items
+*List all points that need clarification based on your analysis of the notes.*
+- **[ ] Open Question:** [e.g., "What formats should be supported for export (CSV, PDF, etc.)?"] - **Owner:** @Product
+- **[ ] Action Item:** [e.g., "Confirm performance requirements for large data exports."] - **Owner:** @Engineering
+---
+## 3. Non-Functional Requirements (NFRs)
+*Infer any NFRs mentioned or implied in the notes. Format as a markdown table.*
+
+| Category      | Requirement                                                | Metric/Standard                  |
+|---------------|------------------------------------------------------------|----------------------------------|
+| Performance   | [e.g., API Response Time]                                  | [e.g., Notes mention "must be fast"] |
+| Security      | [e.g., Authentication]                                     | [e.g., Notes imply "only authenticated users"]|
+| Accessibility | [e.g., Keyboard Navigation]                                | [e.g., Inferred: WCAG 2.1 AA Compliant]    |
+
+---
+## 4. Epic & Work Breakdown Structure
+*A complete deconstruction of the work required, built from the notes.*
+### ### Epic: [Create a high-level Epic title from the notes]
+*This epic covers all work for the features described.*
+---
+### Requirement: [Title for the first requirement identified in the notes]
+- **User Story:** [Write a full user story based on the note]
+- **Priority:** [Assign a logical priority, e.g., P1-High]
+- **Acceptance Criteria:**
+    - [ ] [Create logical acceptance criteria for the requirement.]
+    - [ ] [Add another criterion...]
+
+**Implementation Tasks:**
+*Format as a markdown table.*
+| Discipline | Task Description                                       | Notes                  |
+|------------|--------------------------------------------------------|------------------------|
+| Frontend   | [Create a specific frontend task.]                     | [Any additional notes] |
+| Backend    | [Create a specific backend task.]                      | [Any additional notes] |
+| QA         | [Create a specific testing task.]                      | [e.g., "End-to-end test"] |
+
+**Potential Risks:**
+*Format as a markdown table.*
+| Risk Category | Description                                         | Mitigation Strategy         |
+|---------------|-----------------------------------------------------|-----------------------------|
+| [e.g., Technical] | [Identify any potential risks based on the notes.] | [Suggest a mitigation plan] |
+
+---
+*(Continue this structure for every other feature or requirement identified in the notes...)*
+
+---
+## 5. Strategic Suggestions & Future Enhancements
+*Your analysis and ideas for making this feature better.*
+- **Immediate Improvements (V1.0):**
+    - **Suggestion:** [Provide a specific, actionable idea to improve the initial version of the feature. e.g., "Add a 'Recent Exports' link in the modal so users can quickly re-download files."]
+    - **Rationale:** [Explain why this suggestion adds value.]
+- **Future Roadmap Ideas (V2.0 and beyond):**
+    - **Suggestion:** [Provide a bigger-picture idea for the future. e.g., "Implement scheduled, recurring exports that can be emailed to users automatically."]
+    - **Rationale:** [Explain how this enhancement addresses a deeper user need or business goal.]
+"""
+
+
+# --- Transcript Structure Patterns ---
+# Labels that head notes and sections ("Note:", "Action Items:", "[Agenda]") rather than name a speaker.
+SECTION_LABELS = (
+    "note", "notes", "action item", "action items", "agenda", "summary", "decision", "decisions",
+    "next step", "next steps", "todo", "to-do", "follow-up", "follow-ups", "attendees", "participants",
+    "date", "time", "location", "subject", "topic", "re", "fyi", "ps", "important", "warning",
+    "reminder", "update", "updates", "outcome", "outcomes", "key takeaways", "minutes", "transcript",
+)
+# A speaker turn starts a line with "Sarah:", "Sarah Connor (00:12:31):" or "[John]", unless it is a section label.
+SPEAKER_TURN_PATTERN = re.compile(
+    r"^[ \t]*(?!\[?(?i:" + "|".join(re.escape(label) for label in SECTION_LABELS) + r")[ \t]*[\]:(])"
+    r"(?:\[(?P<bracket>[^\]\n]{1,40})\][ \t]*:?"
+    r"|(?P<name>[A-Z][\w.'-]*(?:[ \t]+[A-Z][\w.'-]*){0,3})[ \t]*(?:\([^)\n]{0,20}\))?[ \t]*:)"
+)
+SENTENCE_BOUNDARY_PATTERN = re.compile(r"(?<=[.!?])\s+")
+
+# --- WordprocessingML Tags (for streaming .docx extraction) ---
+WORD_NAMESPACE = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+W_BODY, W_P, W_T, W_TAB, W_BR, W_CR = (WORD_NAMESPACE + tag for tag in ("body", "p", "t", "tab", "br", "cr"))
+W_TBL, W_TR, W_TC = (WORD_NAMESPACE + tag for tag in ("tbl", "tr", "tc"))
+
+
+# --- Functions ---
+
+def iter_docx_text(docx_file):
+    """
+    Yields the text of a .docx in document order as "\n"-terminated lines, ready for get_text_chunks:
+    one per body paragraph and one per table row (cells joined with " | "), split further at line
+    breaks. `word/document.xml` is stream-parsed straight from the zip and finished elements are
+    discarded, so memory stays flat regardless of document size.
+    Accepts a path, a file-like object or raw bytes.
+    """
+    if isinstance(docx_file, (bytes, bytearray)):
+        docx_file = io.BytesIO(docx_file)
+
+    with zipfile.ZipFile(docx_file) as package, package.open("word/document.xml") as xml_stream:
+        body = None
+        run_text = []
+        cell_stack = []   # Paragraph texts of each open table cell (nested tables stack up).
+        row_stack = []    # Cell texts of each open table row.
+        for event, element in ET.iterparse(xml_stream, events=("start", "end")):
+            tag = element.tag
+            if event == "start":
+                if tag == W_TC:
+                    cell_stack.append([])
+                elif tag == W_TR:
+                    row_stack.append([])
+                elif tag == W_BODY:
+                    body = element
+                continue
+
+            if tag == W_T:
+                run_text.append(element.text or "")
+            elif tag == W_TAB:
+                run_text.append("\t")
+            elif tag in (W_BR, W_CR):
+                run_text.append("\n")
+            elif tag == W_P:
+                text = "".join(run_text)
+                run_text = []
+                if cell_stack:
+                    cell_stack[-1].append(text)
+                else:
+                    yield from _terminated_lines(text)
+            elif tag == W_TC:
+                cell_text = " ".join(p for p in cell_stack.pop() if p)
+                if row_stack:
+                    row_stack[-1].append(cell_text)
+            elif tag == W_TR:
+                row_text = " | ".join(row_stack.pop())
+                if cell_stack:
+                    cell_stack[-1].append(row_text)
+                else:
+                    yield from _terminated_lines(row_text)
+
+            # Drop finished top-level blocks so the parsed tree never grows with the document.
+            if body is not None and tag in (W_P, W_TBL) and not cell_stack:
+                body.clear()
+
+def _terminated_lines(text):
+    return [line + "\n" for line in text.split("\n")]
+
+def get_text_from_docx(docx_file):
+    """Extracts the text of a .docx file (paragraphs and table rows), one per line."""
+    return ''.join(iter_docx_text(docx_file))
+
+def iter_speaker_turns(lines):
+    """Groups an iterable of lines into (speaker, turn_text) pairs in a single pass. Speaker is None until one is seen."""
+    speaker, turn_lines = None, []
+    for line in lines:
+        match = SPEAKER_TURN_PATTERN.match(line)
+        if match:
+            if turn_lines:
+                yield speaker, "".join(turn_lines)
+            speaker = (match.group("bracket") or match.group("name")).strip()
+            turn_lines = [line]
+        else:
+            turn_lines.append(line)
+    if turn_lines:
+        yield speaker, "".join(turn_lines)
+
+def split_long_turn(turn_text, max_chars):
+    """Splits an oversized turn at sentence boundaries, hard-splitting any sentence longer than max_chars."""
+    piece_start = last_boundary = 0
+    boundaries = [m.end() for m in SENTENCE_BOUNDARY_PATTERN.finditer(turn_text)] + [len(turn_text)]
+    for boundary in boundaries:
+        if boundary - piece_start > max_chars and last_boundary > piece_start:
+            yield turn_text[piece_start:last_boundary]
+            piece_start = last_boundary
+        while boundary - piece_start > max_chars:
+            yield turn_text[piece_start:piece_start + max_chars]
+            piece_start += max_chars
+        last_boundary = boundary
+    if piece_start < len(turn_text):
+        yield turn_text[piece_start:]
+
+def is_content_defined_cut(piece, piece_tokens, mean_spacing_tokens):
+    """
+    Decides from the piece's own content alone whether a chunk must end after it. Each piece is a cut
+    point with probability proportional to its size, so cuts fall every `mean_spacing_tokens` on average.
+    """
+    probability = min(1.0, piece_tokens / max(1, mean_spacing_tokens))
+    return (zlib.crc32(piece.encode("utf-8")) & 0xFFFF) < probability * 0x10000
+
+def get_text_chunks(text, token_budget=CHUNK_TOKEN_BUDGET, content_defined=False):
+    """
+    Packs whole speaker turns into chunks of at most ~token_budget estimated tokens, in one linear pass.
+    Turns too large for one chunk are split at sentence boundaries. Instead of overlapping text, each
+    chunk after the first starts with a short header naming the speaker it continues from.
+
+    With `content_defined=True`, chunks also end after pieces the text itself marks as cut points
+    (about one per CDC_ANCHOR_SPACING budgets), wherever the current chunk started. Packing restarts
+    at each of them, so an edit that shifts text only re-packs the chunks up to the next cut point and
+    the rest of the document chunks exactly as before. The unchanged chunks of a revised document then
+    send the same prompts as before and are served from the response cache.
+    """
+    lines = io.StringIO(text) if isinstance(text, str) else text
+    anchor_spacing_tokens = token_budget * CDC_ANCHOR_SPACING
+    chunks, parts, used = [], [], 0
+    last_speaker = None
+
+    for speaker, turn_text in iter_speaker_turns(lines):
+        # Leave room for the header a chunk starting inside this turn opens with.
+        names = [name for name in (speaker, last_speaker) if name]
+        header_room = max((estimate_tokens(f"[Previous speaker: {name}]\n") for name in names), default=0)
+        room = max(2, token_budget - header_room)
+        pieces = [turn_text] if estimate_tokens(turn_text) <= room else split_long_turn(turn_text, (room - 1) * 4)
+        for piece_index, piece in enumerate(pieces):
+            piece_tokens = estimate_tokens(piece)
+            if parts and used + piece_tokens > token_budget:
+                chunks.append("".join(parts))
+                parts, used = [], 0
+            if not parts and speaker and piece_index > 0:
+                parts.append(f"{speaker} (continued): ")
+                used += estimate_tokens(parts[-1])
+            elif not parts and last_speaker:
+                parts.append(f"[Previous speaker: {last_speaker}]\n")
+                used += estimate_tokens(parts[-1])
+            parts.append(piece)
+            used += piece_tokens
+            last_speaker = speaker or last_speaker
+            if content_defined and is_content_defined_cut(piece, piece_tokens, anchor_spacing_tokens):
+                chunks.append("".join(parts))
+                parts, used = [], 0
+
+    if parts:
+        chunks.append("".join(parts))
+    return chunks
+
+class ResponseCache:
+    """
+    Disk-backed (SQLite) cache of model responses keyed by a hash of the model name,
+    generation config and prompt parts. Bounded by total size and TTL, evicting least
+    recently used entries first. Safe to share between worker threads and processes.
+    """
+
+    def __init__(self, path=CACHE_PATH, max_bytes=CACHE_MAX_BYTES, ttl_seconds=CACHE_TTL_SECONDS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses (last_used)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(model_name, config, prompt_parts):
+        """Returns a stable SHA-256 key for one model request."""
+        if isinstance(prompt_parts, str):
+            prompt_parts = [prompt_parts]
+        payload = json.dumps(
+            {"model": model_name, "config": config, "parts": list(prompt_parts)},
+            sort_keys=True,
+            ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Returns the cached response for `key`, or None on a miss or expired entry."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                if row is not None:
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._conn.commit()
+                return None
+            self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            return row[0]
+
+    def put(self, key, response_text):
+        """Stores a response and evicts expired and least recently used entries over budget."""
+        now = time.time()
+        size = len(response_text.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, created, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, response_text, size, now, now)
+            )
+            self._conn.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl_seconds,))
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total > self.max_bytes:
+                evict = []
+                for old_key, old_size in self._conn.execute("SELECT key, size FROM responses ORDER BY last_used ASC"):
+                    if total <= self.max_bytes:
+                        break
+                    evict.append((old_key,))
+                    total -= old_size
+                self._conn.executemany("DELETE FROM responses WHERE key = ?", evict)
+            self._conn.commit()
+
+def get_gemini_response(model, prompt_parts, is_json_output=False, cache=None, rate_limiter=None, stream=False,
+                        telemetry=None, purpose=None, parse=None):
+    """
+    Generic function to get a response from the Gemini model.
+    Served from `cache` when possible; only real model calls consume a `rate_limiter` token.
+    With `stream=True`, returns an iterator of text pieces instead of the full text.
+    With `parse`, returns `parse(text)` instead, and a fresh response is only cached if parsing it
+    raised nothing and returned something other than None, so a truncated or malformed answer is
+    asked for again on the next run rather than replayed from the cache.
+    Each call is recorded as a "model_call" span tagged with `purpose`, including token usage.
+    """
+    config = {"temperature": 0.0}
+    if is_json_output:
+        config["response_mime_type"] = "application/json"
+
+    if stream:
+        return iter_gemini_response(model, prompt_parts, config, cache, rate_limiter, telemetry, purpose)
+
+    with span(telemetry, "model_call", purpose=purpose) as call:
+        cache_key, cached = lookup_cached_response(model, config, prompt_parts, cache)
+        if cached is not None and parse is not None:
+            try:
+                cached = parse(cached)
+            except ValueError:
+                cached = None  # Cached before responses were validated; ask the model again.
+        if cached is not None:
+            call["cached"] = True
+            return cached
+
+        wait_for_rate_limit(rate_limiter, call)
+        response = model.generate_content(prompt_parts, generation_config=config)
+        record_usage(call, response)
+        result = response.text if parse is None else parse(response.text)
+        if cache is not None and result is not None:
+            cache.put(cache_key, response.text)
+        return result
+
+def lookup_cached_response(model, config, prompt_parts, cache):
+    """Returns (cache_key, cached_text); both are None without a cache, and the text is None on a miss."""
+    if cache is None:
+        return None, None
+    cache_key = ResponseCache.make_key(getattr(model, "model_name", MODEL_NAME), config, prompt_parts)
+    return cache_key, cache.get(cache_key)
+
+def wait_for_rate_limit(rate_limiter, call):
+    """Acquires a rate-limiter token, recording the time spent queued on the call's span."""
+    if rate_limiter:
+        queued = time.perf_counter()
+        rate_limiter.acquire()
+        call["queued_seconds"] = round(time.perf_counter() - queued, 6)
+
+def iter_gemini_response(model, prompt_parts, config, cache=None, rate_limiter=None, telemetry=None, purpose=None):
+    """Yields a streamed response piece by piece, caching the assembled text once the stream completes with some text."""
+    with span(telemetry, "model_call", purpose=purpose, streamed=True) as call:
+        cache_key, cached = lookup_cached_response(model, config, prompt_parts, cache)
+        if cached is not None:
+            call["cached"] = True
+            yield cached
+            return
+
+        wait_for_rate_limit(rate_limiter, call)
+        pieces = []
+        for chunk in model.generate_content(prompt_parts, generation_config=config, stream=True):
+            record_usage(call, chunk)  # The final chunk carries the totals.
+            try:
+                text = chunk.text
+            except ValueError:
+                continue  # e.g. a final chunk that only carries the finish reason
+            if text:
+                pieces.append(text)
+                yield text
+        if cache is not None and pieces:
+            cache.put(cache_key, "".join(pieces))
+
+def generate_streamed(model, prompt_parts, cache=None, rate_limiter=None, on_partial_text=None, timings=None,
+                      telemetry=None, purpose=None):
+    """
+    Streams a text response, calling `on_partial_text(text_so_far)` as it grows, and returns the full text.
+    Records `time_to_first_token` and `total_time` (seconds) into `timings` when given.
+    """
+    started = time.perf_counter()
+    pieces = []
+    for piece in get_gemini_response(model, prompt_parts, cache=cache, rate_limiter=rate_limiter, stream=True,
+                                     telemetry=telemetry, purpose=purpose):
+        if not pieces and timings is not None:
+            timings["time_to_first_token"] = time.perf_counter() - started
+        pieces.append(piece)
+        if on_partial_text:
+            on_partial_text("".join(pieces))
+    if timings is not None:
+        timings["total_time"] = time.perf_counter() - started
+    return "".join(pieces)
+
+# Errors worth retrying: rate limits, overloaded or failing backends, timeouts and dropped connections.
+TRANSIENT_ERRORS = (
+    google_exceptions.TooManyRequests,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.InternalServerError,
+    google_exceptions.DeadlineExceeded,
+    ConnectionError,
+    TimeoutError,
+)
+
+def call_with_retries(func, max_attempts=MAX_RETRY_ATTEMPTS, base_delay=RETRY_BASE_DELAY_SECONDS,
+                      max_delay=RETRY_MAX_DELAY_SECONDS, sleep=time.sleep, telemetry=None):
+    """Calls `func()`, retrying transient errors with full-jitter exponential backoff."""
+    for attempt in range(max_attempts):
+        try:
+            return func()
+        except TRANSIENT_ERRORS:
+            if attempt == max_attempts - 1:
+                raise
+            increment(telemetry, "transient_error_retries")
+            sleep(random.uniform(0, min(max_delay, base_delay * 2 ** attempt)))
+
+def content_hash(text):
+    """Returns the SHA-256 hex digest of a piece of text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+class RunCheckpoint:
+    """
+    Persists each chunk's extracted signals to a run directory keyed by the document hash,
+    so a failed or interrupted run only re-analyzes the chunks that are missing.
+    Several runs of the same document may share the directory: writes are best-effort, and
+    clear() leaves it alone while another run in this process is still saving chunks to it.
+    """
+
+    _writers = {}                      # run dir -> runs of this process currently saving chunks to it
+    _writers_lock = threading.Lock()
+
+    def __init__(self, run_dir):
+        self.run_dir = run_dir
+        os.makedirs(run_dir, exist_ok=True)
+
+    @classmethod
+    def for_document(cls, document_text, runs_dir=RUNS_DIR):
+        """Returns the checkpoint for a document, creating its run directory if needed."""
+        return cls(os.path.join(runs_dir, content_hash(document_text)))
+
+    def _chunk_path(self, index):
+        return os.path.join(self.run_dir, f"chunk_{index:05d}.json")
+
+    def load_chunk(self, index, chunk):
+        """Returns the saved signals for a chunk, or None if it has not been analyzed (or has changed)."""
+        try:
+            with open(self._chunk_path(index), encoding="utf-8") as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if saved.get("chunk_hash") != content_hash(chunk):
+            return None
+        return saved.get("signals")
+
+    def save_chunk(self, index, chunk, signals):
+        """
+        Atomically writes a chunk's signals, so an interrupted write never leaves a corrupt file.
+        Returns False instead of raising if the write fails: a checkpoint only saves work on a rerun.
+        """
+        path = self._chunk_path(index)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.run_dir, exist_ok=True)  # Another run of the document may have cleared it.
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"chunk_hash": content_hash(chunk), "signals": signals}, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return False
+        return True
+
+    @contextlib.contextmanager
+    def writing(self):
+        """Marks this run as saving chunks, so that clear() from another run of the document waits for it."""
+        with self._writers_lock:
+            self._writers[self.run_dir] = self._writers.get(self.run_dir, 0) + 1
+        try:
+            yield self
+        finally:
+            with self._writers_lock:
+                remaining = self._writers.pop(self.run_dir) - 1
+                if remaining:
+                    self._writers[self.run_dir] = remaining
+
+    def clear(self):
+        """Removes the run directory once the run has produced its PRD, unless another run is still writing to it."""
+        with self._writers_lock:
+            if not self._writers.get(self.run_dir):
+                shutil.rmtree(self.run_dir, ignore_errors=True)
+
+class RateLimiter:
+    """Thread-safe token bucket that caps how many model calls start per minute."""
+
+    def __init__(self, requests_per_minute, burst=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = requests_per_minute / 60.0
+        self.capacity = float(burst if burst is not None else MAX_CONCURRENT_REQUESTS)
+        self.tokens = self.capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._last = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until a token is available, then consumes it."""
+        while True:
+            with self._lock:
+                now = self._clock()
+                self.tokens = min(self.capacity, self.tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            self._sleep(wait)
+
+def parse_signals(raw_response):
+    """Parses a model's JSON signal list. Returns None if the JSON has an unexpected structure."""
+    data = json.loads(raw_response)
+    if isinstance(data, dict) and "extracted_signals" in data and isinstance(data["extracted_signals"], list):
+        return data["extracted_signals"]
+    elif isinstance(data, list):
+        return data
+    return None
+
+def analyze_chunk(model, chunk, rate_limiter=None, cache=None, telemetry=None, purpose="chunk_extraction"):
+    """Extracts signals from one transcript chunk. Returns None if the JSON has an unexpected structure."""
+    prompt_for_chunk = CHUNK_ANALYSIS_PROMPT.format(chunk_text=chunk)
+    try:
+        signals = get_gemini_response(
+            model, prompt_for_chunk, is_json_output=True, cache=cache, rate_limiter=rate_limiter,
+            telemetry=telemetry, purpose=purpose, parse=parse_signals
+        )
+    except ValueError:
+        increment(telemetry, "json_parse_failures")
+        raise
+    if signals is None:
+        increment(telemetry, "json_unexpected_structure")
+    return signals
+
+def is_sparse(signals, chunk):
+    """True if a chunk yielded suspiciously few signals for its size (see ESCALATION_MIN_SIGNALS_PER_1K_TOKENS)."""
+    return len(signals) < estimate_tokens(chunk) / 1000 * ESCALATION_MIN_SIGNALS_PER_1K_TOKENS
+
+def extract_chunk_signals(model, chunk, rate_limiter=None, cache=None, telemetry=None, extraction_model=None):
+    """
+    Extracts a chunk's signals with retries. With an `extraction_model`, that (faster) model goes first
+    and the chunk is escalated to `model` if its JSON is invalid, its signals are sparse or the call
+    fails outright (e.g. an unknown model name, no access, or its quota still exhausted after retries).
+    """
+    fast_signals = None
+    if extraction_model is not None:
+        try:
+            fast_signals = call_with_retries(
+                lambda: analyze_chunk(extraction_model, chunk, rate_limiter, cache, telemetry), telemetry=telemetry
+            )
+        except ValueError:
+            pass  # Invalid JSON; counted by analyze_chunk.
+        except Exception:
+            increment(telemetry, "extraction_model_errors")
+        if fast_signals is not None and not is_sparse(fast_signals, chunk):
+            return fast_signals
+        increment(telemetry, "chunks_escalated")
+    purpose = "chunk_extraction_escalated" if extraction_model is not None else "chunk_extraction"
+    signals = call_with_retries(
+        lambda: analyze_chunk(model, chunk, rate_limiter, cache, telemetry, purpose), telemetry=telemetry
+    )
+    return signals if signals is not None else fast_signals
+
+def parse_packed_signals(raw_response, chunk_count):
+    """
+    Parses a packed extraction response into one signal list per chunk, in order. Entries that are
+    missing or malformed are None; if none is usable, returns None. Raises ValueError if the response
+    is not valid JSON at all.
+    """
+    data = json.loads(raw_response)
+    entries = data.get("chunks") if isinstance(data, dict) else data
+    results = [None] * chunk_count
+    if not isinstance(entries, list):
+        return None
+    for position, entry in enumerate(entries):
+        if not isinstance(entry, dict) or not isinstance(entry.get("extracted_signals"), list):
+            continue
+        try:
+            index = int(entry.get("chunk", position + 1)) - 1
+        except (TypeError, ValueError):
+            index = position
+        if 0 <= index < chunk_count and results[index] is None:
+            results[index] = entry["extracted_signals"]
+    return results if any(signals is not None for signals in results) else None
+
+def analyze_chunk_pack(model, pack, rate_limiter=None, cache=None, telemetry=None):
+    """Extracts signals from several chunks in one request. Returns one signal list (or None) per chunk."""
+    sections = [PACKED_CHUNK_ANALYSIS_PROMPT.format(chunk_count=len(pack))]
+    for number, chunk in enumerate(pack, start=1):
+        delimiter = PACKED_CHUNK_DELIMITER.format(number=number)
+        sections.append(f"{delimiter}\n{chunk}\n{delimiter}\n")
+    try:
+        packed = get_gemini_response(
+            model, "\n".join(sections), is_json_output=True, cache=cache, rate_limiter=rate_limiter,
+            telemetry=telemetry, purpose="packed_chunk_extraction",
+            parse=lambda raw_response: parse_packed_signals(raw_response, len(pack))
+        )
+    except ValueError:
+        increment(telemetry, "json_parse_failures")
+        packed = None
+    return packed or [None] * len(pack)
+
+def pack_chunk_indices(indices, chunks, pack_size=PACKED_CHUNKS_PER_REQUEST, token_budget=PACKED_REQUEST_TOKEN_BUDGET):
+    """Groups consecutive chunk indices into packs of at most `pack_size` chunks and `token_budget` tokens."""
+    packs, current, used = [], [], 0
+    for i in indices:
+        tokens = estimate_tokens(chunks[i])
+        if current and (len(current) >= pack_size or used + tokens > token_budget):
+            packs.append(current)
+            current, used = [], 0
+        current.append(i)
+        used += tokens
+    if current:
+        packs.append(current)
+    return packs
+
+def run_concurrently(func, items, max_workers=MAX_CONCURRENT_REQUESTS, on_item_done=None):
+    """
+    Calls `func(item)` for every item on a bounded thread pool.
+    Returns one (result, error) pair per item, in input order regardless of completion order.
+    `on_item_done(completed, total)` is called from the calling thread as each item finishes.
+    """
+    results = [(None, None)] * len(items)
+    if not items:
+        return results
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items)))) as executor:
+        futures = {executor.submit(func, item): i for i, item in enumerate(items)}
+        for completed, future in enumerate(as_completed(futures), start=1):
+            i = futures[future]
+            try:
+                results[i] = (future.result(), None)
+            except Exception as e:
+                results[i] = (None, e)
+            if on_item_done:
+                on_item_done(completed, len(items))
+    return results
+
+def analyze_chunks_concurrently(model, chunks, max_workers=MAX_CONCURRENT_REQUESTS, rate_limiter=None, cache=None,
+                                on_chunk_done=None, checkpoint=None, telemetry=None, extraction_model=None,
+                                pack_size=1):
+    """
+    Runs analyze_chunk over all chunks concurrently, retrying transient errors.
+    Returns (signals, error) pairs in chunk order. With a `checkpoint`, chunks saved by an
+    earlier run are reused and each newly analyzed chunk is saved as soon as it completes.
+    With an `extraction_model`, chunks go to it first and are escalated to `model` when needed.
+    With `pack_size` > 1, consecutive chunks share requests; chunks whose packed result is missing,
+    invalid or sparse, or whose whole pack request failed, are re-extracted on their own by `model`.
+    """
+    results = [(None, None)] * len(chunks)
+    pending = []
+    for i, chunk in enumerate(chunks):
+        saved = checkpoint.load_chunk(i, chunk) if checkpoint else None
+        if saved is not None:
+            results[i] = (saved, None)
+        else:
+            pending.append(i)
+
+    resumed = len(chunks) - len(pending)
+    increment(telemetry, "chunks_resumed", resumed)
+    if resumed and on_chunk_done:
+        on_chunk_done(resumed, len(chunks))
+
+    # Without a cascade, a packed chunk is retried alone on the same model rather than escalated.
+    reextract_counter, reextract_purpose = (
+        ("chunks_escalated", "chunk_extraction_escalated") if extraction_model is not None
+        else ("chunks_reextracted", "chunk_extraction")
+    )
+
+    def reextract(i, packed_signals):
+        increment(telemetry, reextract_counter)
+        try:
+            signals = call_with_retries(
+                lambda: analyze_chunk(model, chunks[i], rate_limiter, cache, telemetry, reextract_purpose),
+                telemetry=telemetry
+            )
+        except Exception as e:
+            return (packed_signals, None) if packed_signals is not None else (None, e)
+        return (signals if signals is not None else packed_signals), None
+
+    completed_chunks = [0]
+    progress_lock = threading.Lock()
+
+    def analyze(pack):
+        if len(pack) == 1:
+            outcomes = {pack[0]: (extract_chunk_signals(model, chunks[pack[0]], rate_limiter, cache, telemetry,
+                                                        extraction_model), None)}
+        else:
+            try:
+                packed = call_with_retries(
+                    lambda: analyze_chunk_pack(extraction_model or model, [chunks[i] for i in pack], rate_limiter,
+                                               cache, telemetry),
+                    telemetry=telemetry
+                )
+            except Exception:
+                increment(telemetry, "extraction_model_errors" if extraction_model is not None else "packed_request_errors")
+                packed = [None] * len(pack)
+            outcomes = {}
+            for i, signals in zip(pack, packed):
+                if signals is None or is_sparse(signals, chunks[i]):
+                    outcomes[i] = reextract(i, signals)
+                else:
+                    outcomes[i] = (signals, None)
+        for i, (signals, error) in outcomes.items():
+            if checkpoint and signals is not None and not checkpoint.save_chunk(i, chunks[i], signals):
+                increment(telemetry, "checkpoint_write_failures")
+        with progress_lock:
+            completed_chunks[0] += len(pack)
+        return outcomes
+
+    def report(completed, total):
+        if on_chunk_done:
+            on_chunk_done(resumed + completed_chunks[0], len(chunks))
+
+    packs = pack_chunk_indices(pending, chunks, pack_size) if pack_size > 1 else [[i] for i in pending]
+    with checkpoint.writing() if checkpoint else contextlib.nullcontext():
+        pack_results = run_concurrently(analyze, packs, max_workers=max_workers, on_item_done=report)
+    for pack, (outcomes, error) in zip(packs, pack_results):
+        for i in pack:
+            results[i] = outcomes[i] if error is None else (None, error)
+    return results
+
+def estimate_tokens(text):
+    """Cheap token estimate (~4 characters per token) used for budgeting prompts."""
+    return len(text) // 4 + 1
+
+def serialize_signals(signals):
+    """Serializes signals compactly (no indentation) for the synthesis prompts."""
+    return json.dumps({"all_extracted_signals": signals}, separators=(",", ":"), ensure_ascii=False)
+
+def batch_signals_by_category(signals, token_budget=SIGNAL_BATCH_TOKEN_BUDGET):
+    """
+    Groups signals by category and packs them, in category order, into batches whose
+    estimated serialized size stays within `token_budget`.
+    """
+    by_category = {}
+    for signal in signals:
+        category = signal.get("category", "Unknown") if isinstance(signal, dict) else "Unknown"
+        by_category.setdefault(category, []).append(signal)
+
+    batches = []
+    current, current_tokens = [], 0
+    for category_signals in by_category.values():
+        for signal in category_signals:
+            signal_tokens = estimate_tokens(json.dumps(signal, separators=(",", ":"), ensure_ascii=False))
+            if current and current_tokens + signal_tokens > token_budget:
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(signal)
+            current_tokens += signal_tokens
+    if current:
+        batches.append(current)
+    return batches
+
+def reduce_signal_batch(model, batch, rate_limiter=None, cache=None, telemetry=None):
+    """Consolidates one batch of signals into a smaller, de-duplicated list of signals."""
+    try:
+        signals = get_gemini_response(
+            model,
+            [SIGNAL_REDUCTION_PROMPT, serialize_signals(batch)],
+            is_json_output=True,
+            cache=cache,
+            rate_limiter=rate_limiter,
+            telemetry=telemetry,
+            purpose="signal_reduction",
+            parse=parse_signals
+        )
+    except ValueError:
+        increment(telemetry, "json_parse_failures")
+        raise
+    if signals is None:
+        increment(telemetry, "json_unexpected_structure")
+        raise ValueError("Consolidated signals have an unexpected JSON structure.")
+    return signals
+
+def reduce_signals_hierarchically(model, signals, max_tokens=SINGLE_SHOT_SYNTHESIS_MAX_TOKENS,
+                                  batch_token_budget=SIGNAL_BATCH_TOKEN_BUDGET, max_workers=MAX_CONCURRENT_REQUESTS,
+                                  rate_limiter=None, cache=None, on_status=None, telemetry=None):
+    """
+    Tree-reduces signals until their serialized form fits within `max_tokens`.
+    Each level batches the signals by category and consolidates the batches in parallel.
+    A batch that fails to consolidate keeps its original signals, so nothing is dropped.
+    """
+    level = 0
+    while estimate_tokens(serialize_signals(signals)) > max_tokens:
+        level += 1
+        batches = batch_signals_by_category(signals, batch_token_budget)
+
+        def report(completed, total):
+            if on_status:
+                on_status(f"Phase 2: Consolidating signals (level {level}), batch {completed} of {total}")
+
+        results = run_concurrently(
+            lambda batch: call_with_retries(
+                lambda: reduce_signal_batch(model, batch, rate_limiter, cache, telemetry), telemetry=telemetry
+            ),
+            batches,
+            max_workers=max_workers,
+            on_item_done=report
+        )
+        reduced = []
+        for batch, (batch_signals, error) in zip(batches, results):
+            reduced.extend(batch if error is not None else batch_signals)
+
+        if estimate_tokens(serialize_signals(reduced)) >= estimate_tokens(serialize_signals(signals)):
+            # The model could not shrink the set any further; stop rather than loop forever.
+            break
+        signals = reduced
+    return signals
+
+def process_long_transcript(model, transcript_text, cache=None, on_partial_text=None, timings=None, checkpoint=None,
+                            on_progress=None, on_warning=None, on_error=None, rate_limiter=None,
+                            max_workers=MAX_CONCURRENT_REQUESTS, telemetry=None, collected_signals=None,
+                            incremental=False, extraction_model=None, pack_size=1):
+    """
+    Orchestrates the chunking and synthesis process using Gemini for transcripts.
+    The final PRD is streamed to `on_partial_text`; phase timings are recorded into `timings`.
+    With a `checkpoint`, Phase 1 results survive failures and the next run resumes from them.
+    Progress is reported as `on_progress(fraction, message)`; skipped chunks go to `on_warning(message)`
+    and a run that extracts nothing calls `on_error(message)` and returns None.
+    Chunking, extraction, synthesis and every model call are recorded as spans on `telemetry`.
+    Duplicate and near-duplicate signals are merged before synthesis (see signal_store.SignalStore).
+    If `collected_signals` is a list, the merged signals, with their source chunks, are appended to it.
+    With `incremental`, the transcript is cut at content-defined boundaries, so after a revision only
+    the chunks around the edits miss the `cache` and go to the model again.
+    Phase 1 can route chunks to a faster `extraction_model` (escalating to `model`) and pack up to
+    `pack_size` chunks per request; synthesis always uses `model`.
+    """
+    def report_progress(fraction, message):
+        if on_progress:
+            on_progress(fraction, message)
+
+    def warn(message):
+        if on_warning:
+            on_warning(message)
+
+    run_started = time.perf_counter()
+    with span(telemetry, "chunking", chars=len(transcript_text)) as chunking:
+        chunks = get_text_chunks(transcript_text, content_defined=incremental)
+        chunking["chunks"] = len(chunks)
+    signal_store = SignalStore()
+    report_progress(0, "Phase 1: Analyzing transcript chunks...")
+    total_chunks = len(chunks)
+
+    def update_progress(completed, total):
+        report_progress(completed / total, f"Phase 1: Analyzed chunk {completed} of {total}")
+
+    if rate_limiter is None:
+        rate_limiter = RateLimiter(REQUESTS_PER_MINUTE)
+    with span(telemetry, "extraction", chunks=total_chunks):
+        chunk_results = analyze_chunks_concurrently(
+            model,
+            chunks,
+            max_workers=max_workers,
+            rate_limiter=rate_limiter,
+            cache=cache,
+            on_chunk_done=update_progress,
+            checkpoint=checkpoint,
+            telemetry=telemetry,
+            extraction_model=extraction_model,
+            pack_size=pack_size
+        )
+
+    for i, (signals, error) in enumerate(chunk_results):
+        if error is not None:
+            resume_hint = " Run it again to retry only the failed chunks." if checkpoint else ""
+            warn(f"Could not process chunk {i+1} of {total_chunks} due to an error: {error}. Skipping.{resume_hint}")
+        elif signals is None:
+            warn(f"JSON from chunk {i+1} has an unexpected structure. Skipping.")
+        else:
+            signal_store.add_many(signals, chunk_id=i + 1)
+    with span(telemetry, "signal_merging", signals=signal_store.added) as merging:
+        all_signals = signal_store.to_signals()
+        merge_stats = signal_store.stats()
+        merging.update(merged_signals=len(all_signals), tokens_saved=merge_stats["tokens_saved"])
+    increment(telemetry, "signals_extracted", signal_store.added)
+    increment(telemetry, "signals_merged", merge_stats["exact_duplicates"] + merge_stats["near_duplicates"])
+    increment(telemetry, "synthesis_tokens_saved", merge_stats["tokens_saved"])
+    if collected_signals is not None:
+        collected_signals.extend(signal_store.to_signals(provenance=True))
+
+    report_progress(1.0, "Phase 2: Synthesizing final document from all signals...")
+    
+    if not all_signals:
+        if on_error:
+            on_error("Analysis complete, but no valid requirements could be extracted. The final PRD cannot be generated.")
+        return None
+
+    with span(telemetry, "synthesis", signals=len(all_signals)) as synthesis:
+        if estimate_tokens(serialize_signals(all_signals)) > SINGLE_SHOT_SYNTHESIS_MAX_TOKENS:
+            synthesis["hierarchical"] = True
+            all_signals = reduce_signals_hierarchically(
+                model,
+                all_signals,
+                max_workers=max_workers,
+                rate_limiter=rate_limiter,
+                cache=cache,
+                on_status=lambda message: report_progress(1.0, message),
+                telemetry=telemetry
+            )
+            report_progress(1.0, "Phase 2: Synthesizing final document from consolidated signals...")
+
+        synthesis_started = time.perf_counter()
+        synthesis_timings = {}
+        final_prd = call_with_retries(lambda: generate_streamed(
+            model,
+            [FINAL_SYNTHESIS_PROMPT, serialize_signals(all_signals)],
+            cache=cache,
+            rate_limiter=rate_limiter,
+            on_partial_text=on_partial_text,
+            timings=synthesis_timings,
+            telemetry=telemetry,
+            purpose="synthesis"
+        ), telemetry=telemetry)
+    if timings is not None:
+        timings["analysis_time"] = synthesis_started - run_started
+        timings["time_to_first_token"] = timings["analysis_time"] + synthesis_timings.get("time_to_first_token", 0.0)
+        timings["synthesis_time"] = synthesis_timings["total_time"]
+        timings["total_time"] = time.perf_counter() - run_started
+    
+    if checkpoint and all(error is None and signals is not None for signals, error in chunk_results):
+        checkpoint.clear()
+    return final_prd
+
+def process_pm_notes(model, notes_text, cache=None, on_partial_text=None, timings=None, rate_limiter=None,
+                     telemetry=None):
+    """Processes PM notes directly into a PRD in a single pass, streaming it to `on_partial_text`."""
+    with span(telemetry, "synthesis", chars=len(notes_text)):
+        return call_with_retries(lambda: generate_streamed(
+            model,
+            [PM_NOTES_PROMPT, notes_text],
+            cache=cache,
+            rate_limiter=rate_limiter,
+            on_partial_text=on_partial_text,
+            timings=timings,
+            telemetry=telemetry,
+            purpose="pm_notes"
+        ), telemetry=telemetry)
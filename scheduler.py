@@ -0,0 +1,317 @@
+# scheduler.py
+"""
+Process-wide job scheduler shared by every session of the app.
+
+Sessions submit transcript or PM-notes jobs and poll their status; the jobs run on a shared
+thread pool, and every model call they make passes through one FairCallGate. The gate
+enforces a global budget (calls in flight, requests and tokens per minute) and hands out
+slots with start-time fair queuing across sessions: each session's calls are tagged with a
+virtual start time that advances by the call's estimated tokens, and the lowest tag goes
+next. A session with one small request is therefore served ahead of the backlog of a
+session that already has dozens of chunk requests queued.
+"""
+
+import heapq
+import itertools
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from pipeline import (
+    MAX_CONCURRENT_REQUESTS,
+    MODEL_NAME,
+    REQUESTS_PER_MINUTE,
+    TOKENS_PER_MINUTE,
+    estimate_tokens,
+    process_long_transcript,
+    process_pm_notes,
+)
+from telemetry import RunTelemetry
+
+MAX_RUNNING_JOBS = 32          # Jobs executing at once; they mostly wait on the gate, so this far exceeds the call budget
+JOB_RETENTION_SECONDS = 3600   # Finished jobs nobody collected are dropped after this long
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+
+class FairCallGate:
+    """
+    Admits model calls under a global budget: at most `max_concurrent_calls` in flight, and
+    token buckets of `requests_per_minute` and `tokens_per_minute`. Waiting calls are admitted
+    in start-time fair queuing order across sessions (FIFO when `fair` is False).
+    """
+
+    def __init__(self, max_concurrent_calls=MAX_CONCURRENT_REQUESTS, requests_per_minute=REQUESTS_PER_MINUTE,
+                 tokens_per_minute=TOKENS_PER_MINUTE, fair=True, clock=time.monotonic):
+        self.max_concurrent_calls = max_concurrent_calls
+        self.request_capacity = float(max_concurrent_calls)
+        self.request_rate = requests_per_minute / 60.0
+        self.token_capacity = float(tokens_per_minute)
+        self.token_rate = tokens_per_minute / 60.0
+        self.fair = fair
+        self._clock = clock
+        self._condition = threading.Condition()
+        self._waiting = []               # heap of (start tag, sequence, session id)
+        self._sequence = itertools.count()
+        self._session_finish = {}        # session id -> virtual finish tag of its last queued call
+        self._virtual_time = 0.0
+        self._requests = self.request_capacity
+        self._tokens = self.token_capacity
+        self._last_refill = clock()
+        self.in_flight = 0
+        self.admitted = 0
+        self.tokens_charged = 0
+
+    def _refill(self):
+        now = self._clock()
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        self._requests = min(self.request_capacity, self._requests + elapsed * self.request_rate)
+        self._tokens = min(self.token_capacity, self._tokens + elapsed * self.token_rate)
+
+    def acquire(self, session_id, estimated_tokens):
+        """Blocks until this session's call may start, then reserves a slot and its estimated tokens."""
+        cost = max(1, estimated_tokens)
+        with self._condition:
+            if self.fair:
+                start = max(self._virtual_time, self._session_finish.get(session_id, 0.0))
+                self._session_finish[session_id] = start + cost
+            else:
+                start = 0.0
+            entry = (start, next(self._sequence), session_id)
+            heapq.heappush(self._waiting, entry)
+            needed_tokens = min(cost, self.token_capacity)
+            while True:
+                self._refill()
+                wait = None
+                if self._waiting[0] is entry and self.in_flight < self.max_concurrent_calls:
+                    if self._requests >= 1 and self._tokens >= needed_tokens:
+                        break
+                    wait = max((1 - self._requests) / self.request_rate if self._requests < 1 else 0,
+                               (needed_tokens - self._tokens) / self.token_rate if self._tokens < needed_tokens else 0)
+                self._condition.wait(wait)
+
+            heapq.heappop(self._waiting)
+            self._virtual_time = start
+            self._requests -= 1
+            self._tokens -= cost
+            self.in_flight += 1
+            self.admitted += 1
+            self.tokens_charged += cost
+            if len(self._session_finish) > 1000:
+                self._session_finish = {s: f for s, f in self._session_finish.items() if f > self._virtual_time}
+            self._condition.notify_all()
+
+    def release(self, extra_tokens=0):
+        """Frees a call's slot; `extra_tokens` charges usage beyond the estimate (e.g. the response)."""
+        with self._condition:
+            self.in_flight -= 1
+            self._tokens -= extra_tokens
+            self.tokens_charged += extra_tokens
+            self._condition.notify_all()
+
+    def stats(self):
+        with self._condition:
+            return {"calls_in_flight": self.in_flight, "calls_waiting": len(self._waiting),
+                    "calls_admitted": self.admitted, "tokens_charged": self.tokens_charged}
+
+
+def _estimate_prompt_tokens(prompt_parts):
+    return estimate_tokens(prompt_parts if isinstance(prompt_parts, str) else "".join(prompt_parts))
+
+def _usage_tokens(response):
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return 0
+    return (getattr(usage, "prompt_token_count", 0) or 0) + (getattr(usage, "candidates_token_count", 0) or 0)
+
+
+class GatedModel:
+    """Wraps a model so every call waits for the gate on behalf of one session (streams hold their slot until consumed)."""
+
+    def __init__(self, model, gate, session_id):
+        self._model = model
+        self._gate = gate
+        self._session_id = session_id
+        self.model_name = getattr(model, "model_name", MODEL_NAME)
+
+    def generate_content(self, prompt_parts, stream=False, **kwargs):
+        if stream:
+            return self._stream(prompt_parts, **kwargs)
+        estimated = _estimate_prompt_tokens(prompt_parts)
+        self._gate.acquire(self._session_id, estimated)
+        used = 0
+        try:
+            response = self._model.generate_content(prompt_parts, **kwargs)
+            used = _usage_tokens(response)
+            return response
+        finally:
+            self._gate.release(max(0, used - estimated))
+
+    def _stream(self, prompt_parts, **kwargs):
+        estimated = _estimate_prompt_tokens(prompt_parts)
+        self._gate.acquire(self._session_id, estimated)
+        used = 0
+        try:
+            for chunk in self._model.generate_content(prompt_parts, stream=True, **kwargs):
+                used = _usage_tokens(chunk) or used  # The final chunk carries the totals.
+                yield chunk
+        finally:
+            self._gate.release(max(0, used - estimated))
+
+
+class _Unthrottled:
+    """Rate limiter for scheduled jobs: the gate already paces their calls."""
+
+    def acquire(self):
+        pass
+
+
+class Job:
+    """
+    One submitted run. The scheduler's threads update its fields as the run progresses;
+    sessions read them to render progress, the streamed PRD and the final result.
+    """
+
+    def __init__(self, session_id, kind, telemetry=None):
+        self.id = uuid.uuid4().hex
+        self.session_id = session_id
+        self.kind = kind
+        self.status = JOB_QUEUED
+        self.progress = 0.0
+        self.message = "Waiting for a free worker..."
+        self.partial_text = ""
+        self.warnings = []
+        self.errors = []
+        self.signals = []
+        self.timings = {}
+        self.telemetry = telemetry or RunTelemetry()
+        self.result = None
+        self.traceback = None
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+
+    @property
+    def done(self):
+        return self.status in (JOB_SUCCEEDED, JOB_FAILED)
+
+    def _on_progress(self, fraction, message):
+        self.progress = fraction
+        self.message = message
+
+    def _on_partial_text(self, text):
+        self.partial_text = text
+
+
+class JobScheduler:
+    """Shared job queue and worker pool; every job's model calls go through one FairCallGate."""
+
+    def __init__(self, max_concurrent_calls=MAX_CONCURRENT_REQUESTS, requests_per_minute=REQUESTS_PER_MINUTE,
+                 tokens_per_minute=TOKENS_PER_MINUTE, max_running_jobs=MAX_RUNNING_JOBS, fair=True):
+        self.gate = FairCallGate(max_concurrent_calls, requests_per_minute, tokens_per_minute, fair=fair)
+        self.max_concurrent_calls = max_concurrent_calls
+        self._executor = ThreadPoolExecutor(max_workers=max_running_jobs, thread_name_prefix="prd-job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit_transcript(self, session_id, model, transcript_text, telemetry=None, extraction_model=None, **kwargs):
+        """
+        Queues process_long_transcript for a session; `kwargs` are passed through (cache, checkpoint, ...).
+        An `extraction_model` for Phase 1 is gated like the main model and shares its budget.
+        """
+        if extraction_model is not None:
+            extraction_model = GatedModel(extraction_model, self.gate, session_id)
+
+        def run(job, gated_model):
+            return process_long_transcript(
+                gated_model,
+                transcript_text,
+                on_partial_text=job._on_partial_text,
+                timings=job.timings,
+                on_progress=job._on_progress,
+                on_warning=job.warnings.append,
+                on_error=job.errors.append,
+                rate_limiter=_Unthrottled(),
+                max_workers=self.max_concurrent_calls,
+                telemetry=job.telemetry,
+                collected_signals=job.signals,
+                extraction_model=extraction_model,
+                **kwargs
+            )
+        return self._submit(session_id, "transcript", model, run, telemetry)
+
+    def submit_pm_notes(self, session_id, model, notes_text, telemetry=None, **kwargs):
+        """Queues process_pm_notes for a session; `kwargs` are passed through (e.g. cache)."""
+        def run(job, gated_model):
+            job._on_progress(0.0, "Generating PRD from PM notes...")
+            return process_pm_notes(
+                gated_model,
+                notes_text,
+                on_partial_text=job._on_partial_text,
+                timings=job.timings,
+                rate_limiter=_Unthrottled(),
+                telemetry=job.telemetry,
+                **kwargs
+            )
+        return self._submit(session_id, "pm_notes", model, run, telemetry)
+
+    def _submit(self, session_id, kind, model, run, telemetry):
+        job = Job(session_id, kind, telemetry)
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job, GatedModel(model, self.gate, session_id), run)
+        return job
+
+    def _run(self, job, gated_model, run):
+        job.status = JOB_RUNNING
+        job.started = time.time()
+        job.message = "Starting..."
+        try:
+            job.result = run(job, gated_model)
+            if job.result:
+                job.progress = 1.0
+                job.status = JOB_SUCCEEDED
+            else:
+                job.status = JOB_FAILED
+                if not job.errors:
+                    job.errors.append("No PRD was generated.")
+        except Exception as e:
+            job.errors.append(f"An error occurred during processing: {e}")
+            job.traceback = traceback.format_exc()
+            traceback.print_exc()
+            job.status = JOB_FAILED
+        finally:
+            job.finished = time.time()
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def forget(self, job_id):
+        """Drops a job once its session has collected the result."""
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+    def _prune(self):
+        cutoff = time.time() - JOB_RETENTION_SECONDS
+        for job_id in [j.id for j in self._jobs.values() if j.done and j.finished < cutoff]:
+            del self._jobs[job_id]
+
+    def stats(self):
+        """Jobs by status plus the gate's call counters, across all sessions."""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        counts = {status: 0 for status in (JOB_QUEUED, JOB_RUNNING, JOB_SUCCEEDED, JOB_FAILED)}
+        for job in jobs:
+            counts[job.status] += 1
+        return {"jobs": counts, **self.gate.stats()}
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
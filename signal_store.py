@@ -0,0 +1,211 @@
+# signal_store.py
+"""
+Compact, de-duplicating store for the signals extracted in Phase 1.
+
+Each distinct signal is kept once as a slotted record whose category, speakers and priority
+are small interned ids. Exact duplicates (after normalizing case, punctuation and spacing)
+are found through a hash of the normalized content; near duplicates through MinHash
+signatures of word shingles, bucketed with locality-sensitive hashing so each new signal is
+only compared against a handful of candidates. Merged records keep their provenance: the
+chunks and speakers they came from, how often they were mentioned and the highest priority
+any mention had.
+"""
+
+import hashlib
+import json
+import operator
+import re
+from array import array
+
+NEAR_DUPLICATE_THRESHOLD = 0.8   # Estimated Jaccard similarity at which two signals are merged
+SHINGLE_WORDS = 2                # Words per shingle (one substituted word changes only two)
+MINHASH_BANDS = 6                # LSH bands...
+MINHASH_ROWS = 4                 # ...of this many MinHash values each
+MAX_BUCKET_SCAN = 32             # Most recent records looked at per LSH bucket...
+MAX_CANDIDATES = 16              # ...of which at most this many, sharing the most buckets, are compared
+CHARS_PER_TOKEN = 4              # Same heuristic as pipeline.estimate_tokens
+PRIORITY_RANKS = {"High": 3, "Medium": 2, "Low": 1}
+
+_NON_WORD_PATTERN = re.compile(r"[\W_]+")
+_SIGNAL_FIELDS = ("category", "speaker", "content", "priority_signal")
+_SIGNATURE_BYTES = 2 * MINHASH_BANDS * MINHASH_ROWS
+
+
+def normalize_content(text):
+    """Lowercases and strips punctuation so trivially different phrasings compare equal."""
+    return _NON_WORD_PATTERN.sub(" ", str(text).lower()).strip()
+
+def minhash_signature(normalized):
+    """Returns the MinHash signature of a normalized text's word shingles, or None if it has no words."""
+    words = normalized.split()
+    if not words:
+        return None
+    # One BLAKE2 digest per shingle supplies a 16-bit value for every hash function at once, and it
+    # is stable across processes (unlike hash()), so merged signals and synthesis prompts are too.
+    shingles = {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(max(1, len(words) - SHINGLE_WORDS + 1))}
+    rows = [array("H", hashlib.blake2b(shingle.encode("utf-8"), digest_size=_SIGNATURE_BYTES).digest())
+            for shingle in shingles]
+    return array("H", map(min, zip(*rows)))
+
+
+class _Interner:
+    """Maps repeated strings (categories, speakers, priorities) to small integer ids and back."""
+
+    def __init__(self):
+        self.ids = {}
+        self.values = []
+
+    def id(self, value):
+        value_id = self.ids.get(value)
+        if value_id is None:
+            value_id = self.ids[value] = len(self.values)
+            self.values.append(value)
+        return value_id
+
+
+class SignalRecord:
+    """One distinct signal and the provenance of every mention merged into it."""
+
+    __slots__ = ("content", "category", "priority", "speakers", "chunks", "mentions", "signature", "extra")
+
+    def __init__(self, content, category, priority, speaker, chunk_id, signature, extra):
+        self.content = content
+        self.category = category
+        self.priority = priority
+        self.speakers = [speaker]
+        self.chunks = set() if chunk_id is None else {chunk_id}
+        self.mentions = 1
+        self.signature = signature
+        self.extra = extra
+
+
+class SignalStore:
+    """
+    Collects signals chunk by chunk, merging exact and near-duplicate mentions within a category.
+    `to_signals()` returns the merged list for synthesis and `stats()` reports what merging saved.
+    """
+
+    def __init__(self, threshold=NEAR_DUPLICATE_THRESHOLD):
+        self.threshold = threshold
+        self.records = []
+        self.categories = _Interner()
+        self.speakers = _Interner()
+        self.priorities = _Interner()
+        self._exact = {}    # (category id, normalized content digest) -> record index
+        self._bands = {}    # (band, category id, band values) -> record indices
+        self.added = 0
+        self.exact_duplicates = 0
+        self.near_duplicates = 0
+        self.invalid = 0
+        self.input_chars = 0
+
+    def __len__(self):
+        return len(self.records)
+
+    def add(self, signal, chunk_id=None):
+        """Adds one signal, merging it into an existing record if it duplicates one. Returns the record."""
+        if not isinstance(signal, dict) or not str(signal.get("content") or "").strip():
+            self.invalid += 1
+            return None
+        self.added += 1
+        self.input_chars += len(json.dumps(signal, separators=(",", ":"), ensure_ascii=False)) + 1
+
+        content = str(signal["content"])
+        category = self.categories.id(str(signal.get("category") or "Unknown"))
+        speaker = self.speakers.id(str(signal.get("speaker") or "Unknown"))
+        priority = self.priorities.id(str(signal.get("priority_signal") or ""))
+        normalized = normalize_content(content)
+        exact_key = (category, hashlib.blake2b(normalized.encode("utf-8"), digest_size=8).digest())
+
+        index = self._exact.get(exact_key)
+        if index is not None:
+            self.exact_duplicates += 1
+            return self._merge(self.records[index], speaker, priority, chunk_id)
+
+        signature = minhash_signature(normalized)
+        band_keys = []
+        if signature is not None:
+            shared_buckets = {}
+            for band in range(MINHASH_BANDS):
+                key = (band, category, signature[band * MINHASH_ROWS:(band + 1) * MINHASH_ROWS].tobytes())
+                band_keys.append(key)
+                for candidate in self._bands.get(key, ())[-MAX_BUCKET_SCAN:]:
+                    shared_buckets[candidate] = shared_buckets.get(candidate, 0) + 1
+            if len(shared_buckets) > MAX_CANDIDATES:
+                shared_buckets = dict(sorted(shared_buckets.items(), key=lambda item: (-item[1], item[0]))[:MAX_CANDIDATES])
+            match, best = None, self.threshold
+            for candidate in shared_buckets:
+                similarity = self._similarity(signature, self.records[candidate].signature)
+                if similarity >= best:
+                    match, best = candidate, similarity
+            if match is not None:
+                self.near_duplicates += 1
+                self._exact[exact_key] = match
+                return self._merge(self.records[match], speaker, priority, chunk_id)
+
+        extra = {k: v for k, v in signal.items() if k not in _SIGNAL_FIELDS} or None
+        record = SignalRecord(content, category, priority, speaker, chunk_id, signature, extra)
+        index = len(self.records)
+        self.records.append(record)
+        self._exact[exact_key] = index
+        for key in band_keys:
+            self._bands.setdefault(key, []).append(index)
+        return record
+
+    def add_many(self, signals, chunk_id=None):
+        for signal in signals:
+            self.add(signal, chunk_id)
+
+    @staticmethod
+    def _similarity(a, b):
+        return sum(map(operator.eq, a, b)) / len(a)
+
+    def _merge(self, record, speaker, priority, chunk_id):
+        record.mentions += 1
+        if speaker not in record.speakers:
+            record.speakers.append(speaker)
+        if chunk_id is not None:
+            record.chunks.add(chunk_id)
+        values = self.priorities.values
+        if PRIORITY_RANKS.get(values[priority], 0) > PRIORITY_RANKS.get(values[record.priority], 0):
+            record.priority = priority
+        return record
+
+    def to_signals(self, provenance=False):
+        """
+        Returns the merged signals in first-seen order, in the extraction schema. Merged signals
+        list every speaker and carry a `mentions` count; with `provenance`, each also lists its source chunks.
+        """
+        categories, speakers, priorities = self.categories.values, self.speakers.values, self.priorities.values
+        signals = []
+        for record in self.records:
+            signal = {
+                "category": categories[record.category],
+                "speaker": ", ".join(speakers[s] for s in record.speakers),
+                "content": record.content,
+                "priority_signal": priorities[record.priority],
+            }
+            if record.extra:
+                signal.update(record.extra)
+            if record.mentions > 1:
+                signal["mentions"] = record.mentions
+            if provenance:
+                signal["source_chunks"] = sorted(record.chunks)
+            signals.append(signal)
+        return signals
+
+    def stats(self):
+        """Counts of merged signals and the estimated synthesis prompt tokens saved by merging."""
+        output_chars = len(json.dumps(self.to_signals(), separators=(",", ":"), ensure_ascii=False))
+        tokens_before = self.input_chars // CHARS_PER_TOKEN
+        tokens_after = output_chars // CHARS_PER_TOKEN
+        return {
+            "signals_in": self.added,
+            "signals_out": len(self.records),
+            "exact_duplicates": self.exact_duplicates,
+            "near_duplicates": self.near_duplicates,
+            "invalid_signals": self.invalid,
+            "tokens_before": tokens_before,
+            "tokens_after": tokens_after,
+            "tokens_saved": max(0, tokens_before - tokens_after),
+        }
@@ -0,0 +1,174 @@
+# telemetry.py
+"""
+Per-run instrumentation: timed spans (file decode, docx extraction, chunking, every model
+call with its token usage, synthesis) and event counters, exportable as JSON lines or a
+Prometheus text snapshot. Every helper accepts `telemetry=None` so instrumented code runs
+unchanged when nobody is collecting.
+"""
+
+import json
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+METRIC_PREFIX = "prd_assistant"
+
+
+class RunTelemetry:
+    """Thread-safe collector of spans and counters for one pipeline run."""
+
+    def __init__(self):
+        self.spans = []
+        self.counters = {}
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """
+        Times the enclosed block as a span. Yields the span's attribute dict so the block can
+        attach results (e.g. token counts); an escaping exception is recorded as `error`.
+        """
+        record = dict(attributes)
+        started = time.time()
+        perf_started = time.perf_counter()
+        try:
+            yield record
+        except BaseException as e:
+            record["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            record.update(name=name, start=round(started - self.started, 6),
+                          duration=round(time.perf_counter() - perf_started, 6))
+            with self._lock:
+                self.spans.append(record)
+
+    def add_span(self, name, duration, **attributes):
+        """Records a span that was timed elsewhere (e.g. inside a memoized step) as ending now."""
+        record = dict(attributes, name=name, start=round(time.time() - duration - self.started, 6),
+                      duration=round(duration, 6))
+        with self._lock:
+            self.spans.append(record)
+
+    def increment(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def _span_groups(self):
+        """Aggregates spans by name (and purpose, for model calls)."""
+        groups = {}
+        with self._lock:
+            spans = list(self.spans)
+        for record in spans:
+            key = (record["name"], record.get("purpose", ""))
+            group = groups.setdefault(key, {
+                "span": record["name"], "purpose": key[1], "first_start": record["start"], "count": 0,
+                "seconds": 0.0, "max_seconds": 0.0, "errors": 0, "cached": 0, "prompt_tokens": 0, "output_tokens": 0,
+            })
+            group["first_start"] = min(group["first_start"], record["start"])
+            group["count"] += 1
+            group["seconds"] += record["duration"]
+            group["max_seconds"] = max(group["max_seconds"], record["duration"])
+            group["errors"] += "error" in record
+            group["cached"] += bool(record.get("cached"))
+            group["prompt_tokens"] += record.get("prompt_tokens") or 0
+            group["output_tokens"] += record.get("output_tokens") or 0
+        return sorted(groups.values(), key=lambda g: g.pop("first_start"))
+
+    def summary(self):
+        """Returns one row per span name/purpose with counts, total and max seconds, and tokens."""
+        rows = self._span_groups()
+        for row in rows:
+            row["seconds"] = round(row["seconds"], 3)
+            row["max_seconds"] = round(row["max_seconds"], 3)
+        return rows
+
+    def totals(self):
+        """Returns run-wide totals: model calls, tokens and counters."""
+        with self._lock:
+            model_calls = [s for s in self.spans if s["name"] == "model_call"]
+            counters = dict(self.counters)
+        return {
+            "model_calls": sum(not s.get("cached") for s in model_calls),
+            "cached_calls": sum(bool(s.get("cached")) for s in model_calls),
+            "prompt_tokens": sum(s.get("prompt_tokens") or 0 for s in model_calls),
+            "output_tokens": sum(s.get("output_tokens") or 0 for s in model_calls),
+            **counters,
+        }
+
+    def to_json_lines(self):
+        """One JSON object per span, then one per counter."""
+        with self._lock:
+            lines = [json.dumps({"type": "span", **s}, default=str) for s in self.spans]
+            lines += [json.dumps({"type": "counter", "name": k, "value": v}) for k, v in self.counters.items()]
+        return "\n".join(lines) + "\n"
+
+    def to_prometheus(self, prefix=METRIC_PREFIX):
+        """Renders a Prometheus text-format snapshot of the run."""
+        lines = [
+            f"# HELP {prefix}_span_seconds Wall time spent in pipeline spans.",
+            f"# TYPE {prefix}_span_seconds summary",
+        ]
+        groups = self._span_groups()
+        for g in groups:
+            labels = _labels(span=g["span"], purpose=g["purpose"])
+            lines.append(f"{prefix}_span_seconds_sum{labels} {g['seconds']:.6f}")
+            lines.append(f"{prefix}_span_seconds_count{labels} {g['count']}")
+        lines += [
+            f"# HELP {prefix}_span_max_seconds Slowest single span.",
+            f"# TYPE {prefix}_span_max_seconds gauge",
+        ]
+        lines += [
+            f"{prefix}_span_max_seconds{_labels(span=g['span'], purpose=g['purpose'])} {g['max_seconds']:.6f}"
+            for g in groups
+        ]
+        lines += [
+            f"# HELP {prefix}_model_tokens_total Tokens reported by the model, by direction.",
+            f"# TYPE {prefix}_model_tokens_total counter",
+        ]
+        for g in groups:
+            if g["span"] == "model_call":
+                for direction in ("prompt", "output"):
+                    labels = _labels(purpose=g["purpose"], direction=direction)
+                    lines.append(f"{prefix}_model_tokens_total{labels} {g[direction + '_tokens']}")
+        lines += [
+            f"# HELP {prefix}_events_total Pipeline events such as JSON parse failures.",
+            f"# TYPE {prefix}_events_total counter",
+        ]
+        with self._lock:
+            lines += [f"{prefix}_events_total{_labels(event=k)} {v}" for k, v in sorted(self.counters.items())]
+        return "\n".join(lines) + "\n"
+
+
+def _labels(**labels):
+    """Formats non-empty labels as a Prometheus label set, escaping values."""
+    parts = []
+    for key, value in labels.items():
+        if value == "":
+            continue
+        escaped = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{key}="{escaped}"')
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def span(telemetry, name, **attributes):
+    """`telemetry.span(...)`, or a no-op span yielding a throwaway dict when telemetry is None."""
+    if telemetry is None:
+        return nullcontext(dict(attributes))
+    return telemetry.span(name, **attributes)
+
+def increment(telemetry, name, value=1):
+    """`telemetry.increment(...)`, or nothing when telemetry is None."""
+    if telemetry is not None:
+        telemetry.increment(name, value)
+
+def record_usage(span_record, response):
+    """Copies token counts from a Gemini response's `usage_metadata` onto a span, if present."""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    prompt_tokens = getattr(usage, "prompt_token_count", None)
+    output_tokens = getattr(usage, "candidates_token_count", None)
+    if prompt_tokens:
+        span_record["prompt_tokens"] = prompt_tokens
+    if output_tokens:
+        span_record["output_tokens"] = output_tokens